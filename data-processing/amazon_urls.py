@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+amazon_search_url = "https://www.amazon.in/s?k="
+
+# --- Byte tables for quote_plus-style encoding ---
+# Unreserved bytes stay as they are, space becomes '+', everything else '%XX'.
+# Byte 0 is used as the record separator and passes through untouched.
+_keep = np.zeros(256, dtype=bool)
+for _c in b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-~":
+    _keep[_c] = True
+_keep[0] = True
+_single = np.arange(256, dtype=np.uint8)
+_single[ord(' ')] = ord('+')
+_keep[ord(' ')] = True
+_hex = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)
+
+
+def quote_plus_many(values, prefix=''):
+    """
+    prefix + urllib.parse.quote_plus(v) for a whole list of strings in one pass.
+
+    All strings are joined into one UTF-8 buffer and encoded with NumPy
+    table lookups, so there is no Python call per row.
+    """
+    if not len(values):
+        return []
+    buf = np.frombuffer('\0'.join(values).encode('utf-8'), dtype=np.uint8)
+    if buf.size == 0:
+        return [prefix] * len(values)
+
+    # Unsafe bytes grow to 3 output bytes; every earlier one shifts the
+    # rest by 2, so their output positions are idx + 2 * rank.
+    unsafe = ~_keep[buf]
+    idx = np.flatnonzero(unsafe)
+    out = np.repeat(_single[buf], unsafe.astype(np.intp) * 2 + 1)
+
+    pos = idx + 2 * np.arange(idx.size)
+    b = buf[idx]
+    out[pos] = ord('%')
+    out[pos + 1] = _hex[b >> 4]
+    out[pos + 2] = _hex[b & 15]
+
+    sep = b'\0' + prefix.encode('ascii')
+    return (prefix + out.tobytes().replace(b'\0', sep).decode('ascii')).split('\0')
+
+
+def build_amazon_urls(titles, authors):
+    """Amazon search URL per row ("title author", properly encoded). Rows without a title get None."""
+    titles = pd.Series(titles).astype('string')
+    authors = pd.Series(authors, index=titles.index).astype('string').fillna('')
+    has_title = titles.notna()
+
+    # NUL separates the rows inside quote_plus_many, so it can't be in the data
+    query = (titles[has_title] + ' ' + authors[has_title]).str.replace('\0', '', regex=False).str.strip()
+    urls = pd.Series(None, index=titles.index, dtype='string')
+    urls[has_title] = pd.Series(quote_plus_many(query.tolist(), amazon_search_url),
+                                index=query.index, dtype='string')
+    return urls
+
+
+def fill_amazon_urls(df):
+    """Fill `Amazon_URL` only where it is missing or empty; existing values are kept."""
+    if 'Amazon_URL' in df.columns:
+        current = df['Amazon_URL'].astype('string')
+    else:
+        current = pd.Series(None, index=df.index, dtype='string')
+
+    missing = current.isna() | (current == '')
+    if missing.any():
+        current[missing] = build_amazon_urls(df.loc[missing, 'Book'], df.loc[missing, 'Author'])
+    return current
@@ -0,0 +1,201 @@
+import asyncio
+import os
+import time
+
+import aiohttp
+
+import image_probe
+from fetch_metrics import metrics
+
+# --- Same endpoints as clean_data.py (and the same overrides) ---
+volumes_url = os.getenv("GOOGLE_BOOKS_API_URL", "https://www.googleapis.com/books/v1/volumes")
+cover_url = os.getenv("GOOGLE_BOOKS_COVER_URL",
+                      "https://books.google.com/books/content?id={}&printsec=frontcover&img=1&zoom={}&source=gbs_api")
+
+
+# --- 1. IMAGE HELPERS ---
+async def is_valid_image(session, url):
+    """Check if the image is valid (not a placeholder, not too small)."""
+    return await image_probe.is_valid_image_async(session, url)
+
+
+async def _probe(session, url, cache=None, delay=0, go=None):
+    """
+    is_valid_image with the on-disk cache in front. For hedged probing the
+    download waits `delay` seconds, or less if the `go` event is set first.
+    """
+    if cache is not None:
+        verdict = cache.get_image(url, image_probe.image_verdict_version)
+        if verdict is not None:
+            return verdict
+    if delay:
+        try:
+            await asyncio.wait_for(go.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+    start = time.perf_counter()
+    verdict = await is_valid_image(session, url)
+    metrics.observe('probe_seconds', time.perf_counter() - start)
+    if cache is not None and verdict is not None:
+        cache.put_image(url, verdict, image_probe.image_verdict_version)
+    return verdict
+
+
+async def get_best_image(session, book_id, probe_mode="parallel", hedge_delay=0.25, cache=None):
+    """
+    Try different zoom levels to find the clearest valid image.
+
+    "sequential" probes zoom 6 down to 1 one after another (the old way).
+    "parallel" fires all six at once, "hedged" starts them `hedge_delay`
+    seconds apart, or sooner once every higher zoom came back invalid. Both
+    return the highest valid zoom as soon as every higher
+    zoom is known to be invalid, and cancel the downloads still running.
+    """
+    if cache is not None:
+        cached = cache.get_volume(book_id, image_probe.image_verdict_version)
+        if cached is not None:
+            return cached or None
+
+    zooms = range(6, 0, -1)  # try highest to lowest
+    best = None
+    winner = 'none'
+    definite = True  # False if a probe failed, then the answer isn't cached
+
+    if probe_mode == "sequential":
+        for zoom in zooms:
+            url = cover_url.format(book_id, zoom)
+            verdict = await _probe(session, url, cache)
+            if verdict:
+                best = url
+                winner = zoom
+                break
+            definite = definite and verdict is not None
+    else:
+        step = hedge_delay if probe_mode == "hedged" else 0
+        # go[zoom] is set when every higher zoom is out, so it needn't wait its turn
+        go = {zoom: asyncio.Event() for zoom in zooms}
+        tasks = {
+            zoom: asyncio.create_task(_probe(session, cover_url.format(book_id, zoom), cache, i * step, go[zoom]))
+            for i, zoom in enumerate(zooms)
+        }
+        try:
+            for zoom in zooms:
+                verdict = await tasks[zoom]
+                if verdict:
+                    best = cover_url.format(book_id, zoom)
+                    winner = zoom
+                    break
+                definite = definite and verdict is not None
+                if zoom - 1 in go:
+                    go[zoom - 1].set()
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    metrics.count('zoom_winner', winner)
+    if cache is not None and definite:
+        cache.put_volume(book_id, best, image_probe.image_verdict_version)
+    return best
+
+
+# --- 2. LOOKUP ---
+async def get_image_url(session, book_title, scheduler, max_errors=None, probe_mode="parallel", cache=None):
+    """Async version of clean_data.get_image_url. Only this task waits on a rate limit."""
+    if cache is not None:
+        hit = cache.get_lookup(book_title)
+        if hit is not None:
+            return await _pick_image(session, hit.get('volume_id'), hit.get('thumbnail'), probe_mode, cache)
+
+    if max_errors is None:
+        max_errors = 3 * len(scheduler.keys)
+    errors = 0
+
+    while True:
+        start = time.perf_counter()
+        api_key = await scheduler.acquire_async()
+        metrics.waited(time.perf_counter() - start)
+        metrics.key_event(scheduler.label(api_key), 'requests')
+        params = {'q': f'intitle:{book_title}', 'key': api_key, 'maxResults': 1}
+
+        start = time.perf_counter()
+        try:
+            async with session.get(volumes_url, params=params,
+                                   timeout=aiohttp.ClientTimeout(total=10)) as response:
+                if response.status == 429:
+                    metrics.key_event(scheduler.label(api_key), '429')
+                    delay = scheduler.penalize(api_key, response.headers.get("Retry-After"))
+                    print(f"⚠️ {scheduler.label(api_key)} hit rate limit. Resting it for {delay:.0f}s...")
+                    continue
+
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+            metrics.observe('lookup_seconds', time.perf_counter() - start)
+            scheduler.report_success(api_key)
+            break
+
+        # ValueError: a 200 with a body that isn't JSON (captive portal, HTML error page)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            print(f"  Error fetching '{book_title}' with {scheduler.label(api_key)}: {e}")
+            metrics.key_event(scheduler.label(api_key), 'errors')
+            scheduler.penalize(api_key, 5)
+            errors += 1
+            if errors >= max_errors:
+                return None
+
+    book_id, thumbnail = None, None
+    if 'items' in data and len(data['items']) > 0:
+        volume = data['items'][0]
+        book_id = volume.get('id')
+        thumbnail = volume.get('volumeInfo', {}).get('imageLinks', {}).get('thumbnail')
+
+    if cache is not None:
+        cache.put_lookup(book_title, book_id, thumbnail)
+    return await _pick_image(session, book_id, thumbnail, probe_mode, cache)
+
+
+async def _pick_image(session, book_id, thumbnail, probe_mode, cache):
+    """Clearest zoom version if there is one, else the search thumbnail."""
+    if book_id:
+        best_img = await get_best_image(session, book_id, probe_mode, cache=cache)
+        if best_img:
+            metrics.count('image_source', 'zoom')
+            return best_img
+
+    # fallback: thumbnail if zoom versions fail
+    metrics.count('image_source', 'thumbnail' if thumbnail else 'none')
+    return thumbnail
+
+
+# --- 3. DRIVER ---
+async def fetch_all(titles, scheduler, on_result, concurrency=None, probe_mode="parallel", cache=None):
+    """
+    Fetch cover URLs for many titles at once.
+
+    `titles` is a list of (index, title) pairs. `on_result(index, url)` is
+    called on the event loop as each book finishes, so callers can update
+    their DataFrame without locking. At most `concurrency` books are in flight;
+    the key scheduler decides how fast lookups actually go out. `probe_mode`
+    is passed on to get_best_image; `cache` is an optional LookupCache.
+    """
+    if concurrency is None:
+        concurrency = 4 * len(scheduler.keys)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    # A book can have up to six zoom probes open at the same time
+    probes = 1 if probe_mode == "sequential" else 6
+    connector = aiohttp.TCPConnector(limit=concurrency * probes, ttl_dns_cache=300)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+
+        async def worker(index, title):
+            async with semaphore:
+                try:
+                    url = await get_image_url(session, title, scheduler, probe_mode=probe_mode, cache=cache)
+                except Exception as e:
+                    # One book's failure must not cancel the others in the gather
+                    print(f"  ⚠️ Giving up on '{title}': {e!r}")
+                    url = None
+            on_result(index, url)
+
+        await asyncio.gather(*(worker(index, title) for index, title in titles))
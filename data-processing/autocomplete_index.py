@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+from genre_index import delta_decode, delta_encode
+from near_duplicates import fold_text
+
+# Word prefixes up to this length get a precomputed top list
+max_prefix = 4
+prefix_top = 8
+# Books listed under an author suggestion
+author_books = 5
+# Share of the query's trigrams a suggestion needs for a fuzzy match
+min_trigram_share = 0.5
+
+
+def trigrams(text):
+    """3-grams of folded text with word edges marked, e.g. 'dune' -> ' du', 'dun', 'une', 'ne '."""
+    t = f' {text} '
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+
+def _ratings(df):
+    if 'Num_Ratings' not in df.columns:
+        return np.zeros(len(df))
+    values = df['Num_Ratings'].astype('string').str.replace(',', '', regex=False)
+    return pd.to_numeric(values, errors='coerce').fillna(0).to_numpy()
+
+
+# --- 1. BUILDING ---
+def build_autocomplete_index(df):
+    """
+    Autocomplete index over Book and Author for client/public/autocomplete_index.json.
+
+    Book ids are row positions in books_full.json (like genre_index.json).
+    Suggestions are one per book title plus one per author, sorted by
+    Num_Ratings (an author counts the ratings of all their books), so a
+    suggestion's id is its popularity rank and every posting list below is
+    already in ranking order:
+
+      prefixes  word prefix (1..max_prefix chars) -> top suggestion ids
+      trigrams  trigram -> delta-encoded suggestion ids, for longer or misspelled queries
+
+    Text is matched after fold_text (NFKD, accents dropped, lowercase,
+    punctuation to spaces); the client has to fold queries the same way.
+    """
+    ratings = _ratings(df)
+    books = df['Book'].astype('string').fillna('').tolist()
+    authors = df['Author'].astype('string').fillna('').tolist() if 'Author' in df.columns else [''] * len(df)
+
+    # (kind, text, author, book ids, score)
+    suggestions = [('title', b, a, [i], float(r)) for i, (b, a, r) in enumerate(zip(books, authors, ratings)) if b]
+
+    by_author = pd.DataFrame({'key': [fold_text(a) for a in authors], 'name': authors, 'ratings': ratings})
+    by_author = by_author[by_author['key'] != '']
+    for _, group in by_author.groupby('key', sort=False):
+        top = group.sort_values('ratings', ascending=False, kind='stable')
+        suggestions.append(('author', group['name'].iat[0], None, top.index[:author_books].tolist(),
+                            float(group['ratings'].sum())))
+
+    suggestions.sort(key=lambda s: -s[4])  # stable: ties keep file order
+
+    prefixes, postings = {}, {}
+    for sid, (kind, text, _, _, _) in enumerate(suggestions):
+        folded = fold_text(text)
+        # "The Theory of Everything" has 'th' twice but is listed under it once
+        own = {word[:n] for word in folded.split() for n in range(1, min(max_prefix, len(word)) + 1)}
+        for prefix in sorted(own):
+            top = prefixes.setdefault(prefix, [])
+            if len(top) < prefix_top:
+                top.append(sid)
+        for gram in trigrams(folded):
+            postings.setdefault(gram, []).append(sid)
+
+    return {
+        'version': 1,
+        'num_books': len(df),
+        'normalize': 'NFKD, drop combining marks, lowercase, non-word characters to spaces',
+        'max_prefix': max_prefix,
+        'fields': ['kind', 'text', 'author', 'books', 'score'],
+        'suggestions': [[k, t, a, b, int(s)] for k, t, a, b, s in suggestions],
+        'prefixes': dict(sorted(prefixes.items())),
+        'trigrams': {g: delta_encode(ids) for g, ids in sorted(postings.items())},
+    }
+
+
+# --- 2. QUERYING (reference for the client) ---
+def load_autocomplete_index(path):
+    import json
+    with open(path, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    index['trigrams'] = {g: delta_decode(d) for g, d in index['trigrams'].items()}
+    return index
+
+
+def _one_edit(word, alphabet):
+    """Every string one deletion, transposition, substitution or insertion away from `word`."""
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    out = {a + b[1:] for a, b in splits if b}
+    out |= {a + b[1] + b[0] + b[2:] for a, b in splits if len(b) > 1}
+    out |= {a + c + b[1:] for a, b in splits if b for c in alphabet}
+    out |= {a + c + b for a, b in splits for c in alphabet}
+    out.discard(word)
+    return out
+
+
+def suggest(index, query, limit=10):
+    """
+    Suggestions (the 'suggestions' rows) for what has been typed so far.
+
+    Short single words are one dictionary lookup. When that finds nothing
+    (a typo: 'dnue'), the prefixes one edit away are looked up, most
+    popular first. Longer queries, and short ones still without a match,
+    are ranked by how many of the query's trigrams they contain, then by
+    popularity, so small typos still match.
+    """
+    q = fold_text(query)
+    if not q:
+        return []
+    rows = index['suggestions']
+    if len(q) <= index['max_prefix'] and ' ' not in q:
+        exact = index['prefixes'].get(q, [])
+        if exact:
+            return [rows[i] for i in exact[:limit]]
+        if '_alphabet' not in index:
+            index['_alphabet'] = sorted({c for p in index['prefixes'] for c in p})
+        near = {i for v in _one_edit(q, index['_alphabet']) for i in index['prefixes'].get(v, [])}
+        if near:
+            return [rows[i] for i in sorted(near)[:limit]]  # ids are popularity ranks
+
+    grams = trigrams(q)
+    # The last word may be unfinished: drop its closing edge trigram
+    grams.discard(q[-2:] + ' ')
+    lists = [index['trigrams'][g] for g in grams if g in index['trigrams']]
+    if not lists:
+        return []
+    hits = np.bincount(np.concatenate(lists), minlength=len(rows))
+    need = max(1, int(np.ceil(min_trigram_share * len(grams))))
+    candidates = np.flatnonzero(hits >= need)
+    # Most trigrams matched first; ids are popularity ranks, so ties go to the popular one
+    best = candidates[np.lexsort((candidates, -hits[candidates]))][:limit]
+    return [rows[i] for i in best]
@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from amazon_urls import fill_amazon_urls  # noqa: E402
+
+
+# --- The old row-by-row version from update_url.py, kept as the baseline ---
+def make_amazon_url(title, author):
+    if pd.isna(title):
+        return None
+    t = str(title).replace(" ", "+")
+    a = str(author).replace(" ", "+")
+    return f"https://www.amazon.in/s?k={t}+{a}"
+
+
+def apply_path(df):
+    return df.apply(
+        lambda row: make_amazon_url(row['Book'], row['Author'])
+        if pd.isna(row['Amazon_URL']) or row['Amazon_URL'] == ""
+        else row['Amazon_URL'],
+        axis=1
+    )
+
+
+def make_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    words = np.array(['The', 'Night', 'Café', 'Harry', 'Potter', '&', 'Sons', '#1', 'Über', 'of', 'Dune', 'Lost'])
+    titles = [' '.join(rng.choice(words, size=rng.integers(1, 6))) for _ in range(n)]
+    authors = [' '.join(rng.choice(words, size=2)) for _ in range(n)]
+    return pd.DataFrame({'Book': titles, 'Author': authors, 'Amazon_URL': [None] * n})
+
+
+def best_of(fn, df, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(df)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    df = make_frame(n)
+
+    old = best_of(apply_path, df, 1)
+    new = best_of(fill_amazon_urls, df, 3)
+    print(f"rows: {n}")
+    print(f"apply (old):      {old * 1000:9.1f} ms")
+    print(f"vectorized (new): {new * 1000:9.1f} ms  ({old / new:.0f}x faster)")
@@ -0,0 +1,74 @@
+"""
+Load-test async_fetcher.fetch_all against the fake Google Books server,
+started in-process on a free port. No network access needed.
+
+    python benchmarks/bench_fetcher.py --books 500 --keys 3 --concurrency 4 12 --probe-mode parallel hedged
+    python benchmarks/bench_fetcher.py --books 200 --server-args="--key-rate 2 --throttle-rate 0.05"
+"""
+import argparse
+import asyncio
+import os
+import shlex
+import sys
+import time
+from collections import Counter
+
+from aiohttp import web
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, '..'))
+sys.path.insert(0, here)
+import async_fetcher  # noqa: E402
+from fake_google_books import build_parser, make_app  # noqa: E402
+from key_scheduler import KeyScheduler  # noqa: E402
+from synthetic_data import generate_catalog  # noqa: E402
+
+
+async def run_once(titles, keys, concurrency, probe_mode, server_args, key_rate, key_burst):
+    app = make_app(server_args)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    base = f"http://127.0.0.1:{port}"
+    async_fetcher.volumes_url = f"{base}/books/v1/volumes"
+    async_fetcher.cover_url = f"{base}/books/content?id={{}}&printsec=frontcover&img=1&zoom={{}}&source=gbs_api"
+
+    results = {}
+    scheduler = KeyScheduler(keys, rate=key_rate, burst=key_burst)
+    start = time.perf_counter()
+    try:
+        await async_fetcher.fetch_all(list(enumerate(titles)), scheduler, results.__setitem__,
+                                      concurrency=concurrency, probe_mode=probe_mode)
+    finally:
+        elapsed = time.perf_counter() - start
+        await runner.cleanup()
+
+    found = Counter('cover' if url else 'none' for url in results.values())
+    return elapsed, found, dict(app['stats'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the async fetcher against the fake server.')
+    parser.add_argument('--books', type=int, default=300)
+    parser.add_argument('--keys', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4, 12])
+    parser.add_argument('--probe-mode', nargs='+', default=['parallel'], choices=['sequential', 'parallel', 'hedged'])
+    parser.add_argument('--key-rate', type=float, default=50, help='client-side requests/sec per key')
+    parser.add_argument('--key-burst', type=float, default=5)
+    parser.add_argument('--server-args', default='', help='flags passed on to fake_google_books.py')
+    args = parser.parse_args()
+
+    server_args = build_parser().parse_args(shlex.split(args.server_args))
+    titles = generate_catalog(args.books)['Book'].tolist()
+    keys = [f"fake-key-{i}" for i in range(args.keys)]
+
+    print(f"{'probe':<10} {'conc':>5} {'secs':>7} {'books/s':>8}  found / server stats")
+    for probe_mode in args.probe_mode:
+        for concurrency in args.concurrency:
+            elapsed, found, stats = asyncio.run(run_once(
+                titles, keys, concurrency, probe_mode, server_args, args.key_rate, args.key_burst))
+            print(f"{probe_mode:<10} {concurrency:>5} {elapsed:7.2f} {len(titles) / elapsed:8.1f}  "
+                  f"{dict(found)} covers={stats.get('cover_requests', 0)} 429={stats.get('429', 0)}")
@@ -0,0 +1,59 @@
+"""
+Throughput of mongo_loader.load_books against a real mongod (local or
+docker, e.g. `docker run -p 27017:27017 mongo:7`). Synthetic books are
+written to a throwaway database, which is dropped afterwards.
+
+    python benchmarks/bench_mongo_loader.py --books 100000 --batch-size 500 1000 5000 --concurrency 1 4 8
+
+Each configuration loads into an empty collection (all inserts), then loads
+the same books again (all matched, nothing modified), which is what a
+rerun with --all costs.
+"""
+import argparse
+import os
+import sys
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, '..'))
+sys.path.insert(0, here)
+from pymongo import MongoClient  # noqa: E402
+
+from mongo_loader import collection_name, ensure_indexes, load_books, mongodb_uri, to_book_document  # noqa: E402
+from pipeline_state import book_keys  # noqa: E402
+from synthetic_data import generate_catalog  # noqa: E402
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))] if sorted_values else 0.0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark bulk upserts into MongoDB.')
+    parser.add_argument('--books', type=int, default=100_000)
+    parser.add_argument('--uri', default=mongodb_uri)
+    parser.add_argument('--db', default='bookwormed_loader_bench')
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[1000])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4])
+    args = parser.parse_args()
+
+    df = generate_catalog(args.books)
+    items = list(zip(book_keys(df), (to_book_document(r) for r in df.to_dict('records'))))
+
+    client = MongoClient(args.uri, maxPoolSize=max(args.concurrency) + 1)
+    collection = client[args.db][collection_name]
+    print(f"{'batch':>6} {'conc':>5} {'pass':<7} {'secs':>7} {'books/s':>9} {'p50 ms':>7} {'p95 ms':>7}")
+    try:
+        for size in args.batch_size:
+            for concurrency in args.concurrency:
+                collection.drop()
+                ensure_indexes(collection)
+                for label in ('insert', 'rerun'):
+                    totals = load_books(collection, items, size, concurrency)
+                    lat = totals['batch_seconds']
+                    print(f"{size:>6} {concurrency:>5} {label:<7} {totals['seconds']:7.2f} "
+                          f"{totals['books'] / totals['seconds']:9,.0f} {percentile(lat, 0.5) * 1000:7.0f} "
+                          f"{percentile(lat, 0.95) * 1000:7.0f}"
+                          + (f"  {len(totals['failed'])} failed" if totals['failed'] else ''))
+    finally:
+        client.drop_database(args.db)
+        client.close()
@@ -0,0 +1,262 @@
+"""
+Local stand-in for the two Google endpoints clean_data.py talks to:
+
+    /books/v1/volumes   search, returns at most one volume per title
+    /books/content      cover images at zoom 1..6
+
+Run it, then point the fetcher at it (it prints the two lines to use):
+
+    python benchmarks/fake_google_books.py --port 8765 --latency lognormal:80,0.6 --key-rate 2
+    GOOGLE_BOOKS_API_URL=http://127.0.0.1:8765/books/v1/volumes
+    GOOGLE_BOOKS_COVER_URL=http://127.0.0.1:8765/books/content?id={}&printsec=frontcover&img=1&zoom={}&source=gbs_api
+
+Use LOOKUP_CACHE=off (or a separate LOOKUP_CACHE_PATH) with it, so fake
+volume ids don't end up in the real lookup cache.
+
+Everything a volume looks like is derived from a hash of its title / id and
+--seed, so two runs with the same flags serve the same catalog.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+from collections import Counter
+from io import BytesIO
+
+import numpy as np
+from aiohttp import web
+from PIL import Image, ImageDraw
+
+
+# --- 1. LATENCY ---
+def parse_latency(spec):
+    """
+    'fixed:MS', 'uniform:LOW,HIGH' or 'lognormal:MEDIAN,SIGMA' (milliseconds)
+    -> a function returning one delay in seconds.
+    """
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',') if v]
+    if kind == 'fixed':
+        return lambda rng: values[0] / 1000
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == 'lognormal':
+        import math
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+# --- 2. PER-KEY QUOTA ---
+class KeyQuota:
+    """Server-side token bucket per API key, like Google's per-key quota."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+
+    def take(self, key):
+        """0 if the request may go through, else the seconds until it could."""
+        if not self.rate:
+            return 0
+        now = time.monotonic()
+        tokens, last = self.buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens >= 1:
+            self.buckets[key] = (tokens - 1, now)
+            return 0
+        self.buckets[key] = (tokens, now)
+        return (1 - tokens) / self.rate
+
+
+# --- 3. CATALOG ---
+def _fraction(*parts):
+    """Deterministic number in [0, 1) for the given values."""
+    digest = hashlib.blake2b('\x1f'.join(map(str, parts)).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2 ** 64
+
+
+class FakeCatalog:
+    """Which titles exist and what their covers look like."""
+
+    def __init__(self, seed=0, miss_rate=0.1, no_cover_rate=0.15, undersized_rate=0.2):
+        self.seed = seed
+        self.miss_rate = miss_rate
+        self.no_cover_rate = no_cover_rate
+        self.undersized_rate = undersized_rate
+        self.images = {}
+
+    def volume_id(self, title):
+        if _fraction(self.seed, 'miss', title) < self.miss_rate:
+            return None
+        return 'fake' + hashlib.sha1(f"{self.seed}:{title}".encode('utf-8')).hexdigest()[:12]
+
+    def best_zoom(self, volume_id):
+        """Highest zoom with a real cover; 0 means every zoom is a placeholder."""
+        if _fraction(self.seed, 'cover', volume_id) < self.no_cover_rate:
+            return 0
+        return 1 + int(_fraction(self.seed, 'zoom', volume_id) * 6)
+
+    def cover(self, volume_id, zoom):
+        """(kind, bytes, content type) of one cover request."""
+        best = self.best_zoom(volume_id)
+        if zoom <= best:
+            kind = 'valid'
+        elif _fraction(self.seed, 'small', volume_id, zoom) < self.undersized_rate:
+            kind = 'undersized'
+        else:
+            kind = 'placeholder'
+        if kind == 'valid':
+            return (kind,) + self._cover_art(volume_id, zoom)
+        return (kind,) + self._image(kind, zoom)
+
+    def _cover_art(self, volume_id, zoom):
+        """A blocky picture unique to the volume, scaled with the zoom level."""
+        rng = np.random.default_rng(int(_fraction(self.seed, 'art', volume_id) * 2 ** 63))
+        blocks = rng.integers(0, 256, size=(9, 6, 3), dtype=np.uint8)
+        img = Image.fromarray(blocks).resize((64 + 64 * zoom, 96 + 96 * zoom), Image.NEAREST)
+        buf = BytesIO()
+        img.save(buf, 'JPEG', quality=80)
+        return buf.getvalue(), 'image/jpeg'
+
+    def _image(self, kind, zoom):
+        # Placeholders look the same for every volume, so they're encoded once
+        if (kind, zoom) not in self.images:
+            if kind == 'undersized':
+                img = Image.new('RGB', (60, 90), (90, 40, 40))
+                fmt, content_type = 'JPEG', 'image/jpeg'
+            else:
+                # Google's "image not available" card: white with a grey frame
+                # and dark lettering, so a brightness rule alone doesn't catch it
+                img = Image.new('RGB', (128, 192), (255, 255, 255))
+                draw = ImageDraw.Draw(img)
+                draw.rectangle([6, 6, 121, 185], outline=(200, 200, 200), width=2)
+                draw.text((22, 84), "image not", fill=(60, 60, 60))
+                draw.text((22, 98), "available", fill=(60, 60, 60))
+                fmt, content_type = 'PNG', 'image/png'
+            buf = BytesIO()
+            img.save(buf, fmt)
+            self.images[(kind, zoom)] = (buf.getvalue(), content_type)
+        return self.images[(kind, zoom)]
+
+
+# --- 4. SERVER ---
+def make_app(args):
+    rng = random.Random(args.seed)
+    latency = parse_latency(args.latency)
+    cover_latency = parse_latency(args.cover_latency or args.latency)
+    quota = KeyQuota(args.key_rate, args.key_burst)
+    catalog = FakeCatalog(args.seed, args.miss_rate, args.no_cover_rate, args.undersized_rate)
+    throttle = dict(args.throttle or [])
+    stats = Counter()
+
+    async def misbehave(request, delay):
+        """Common latency / timeout / 5xx injection. Returns a response to send instead, or None."""
+        if rng.random() < args.timeout_rate:
+            stats['timeouts'] += 1
+            await asyncio.sleep(args.hang)
+            return web.Response(status=504)
+        await asyncio.sleep(delay)
+        if rng.random() < args.error_rate:
+            stats['errors'] += 1
+            return web.Response(status=503)
+        return None
+
+    async def volumes(request):
+        stats['volume_requests'] += 1
+        key = request.query.get('key', '')
+        stats[f'key:{key[-4:]}'] += 1
+
+        wait = quota.take(key)
+        if not wait and rng.random() < throttle.get(key, args.throttle_rate):
+            wait = args.retry_after
+        if wait:
+            stats['429'] += 1
+            headers = {'Retry-After': str(max(1, round(wait)))} if args.send_retry_after else {}
+            return web.Response(status=429, headers=headers)
+
+        failed = await misbehave(request, latency(rng))
+        if failed is not None:
+            return failed
+
+        title = request.query.get('q', '').removeprefix('intitle:')
+        volume_id = catalog.volume_id(title)
+        if volume_id is None:
+            stats['misses'] += 1
+            return web.json_response({'kind': 'books#volumes', 'totalItems': 0})
+
+        thumbnail = str(request.url.with_path('/books/content').with_query(
+            {'id': volume_id, 'printsec': 'frontcover', 'img': '1', 'zoom': '1', 'source': 'gbs_api'}))
+        return web.json_response({
+            'kind': 'books#volumes',
+            'totalItems': 1,
+            'items': [{'id': volume_id, 'volumeInfo': {'title': title, 'imageLinks': {'thumbnail': thumbnail}}}],
+        })
+
+    async def content(request):
+        stats['cover_requests'] += 1
+        failed = await misbehave(request, cover_latency(rng))
+        if failed is not None:
+            return failed
+
+        volume_id = request.query.get('id', '')
+        zoom = int(request.query.get('zoom', '1') or 1)
+        kind, body, content_type = catalog.cover(volume_id, zoom)
+        stats[f'cover:{kind}'] += 1
+        return web.Response(body=body, content_type=content_type)
+
+    async def show_stats(request):
+        return web.json_response(dict(stats))
+
+    app = web.Application()
+    app.router.add_get('/books/v1/volumes', volumes)
+    app.router.add_get('/books/content', content)
+    app.router.add_get('/stats', show_stats)
+    app['stats'] = stats
+    return app
+
+
+def parse_throttle(value):
+    key, _, p = value.rpartition('=')
+    return key, float(p)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Fake Google Books volumes + cover server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', default='lognormal:80,0.5', help='volumes latency (ms), see parse_latency')
+    parser.add_argument('--cover-latency', default=None, help='cover latency (ms); defaults to --latency')
+    parser.add_argument('--key-rate', type=float, default=0, help='requests/sec allowed per key (0 = unlimited)')
+    parser.add_argument('--key-burst', type=float, default=5)
+    parser.add_argument('--throttle-rate', type=float, default=0, help='chance of a 429 for any key')
+    parser.add_argument('--throttle', type=parse_throttle, action='append', metavar='KEY=P',
+                        help='chance of a 429 for one key (repeatable)')
+    parser.add_argument('--retry-after', type=float, default=10, help='Retry-After for injected 429s')
+    parser.add_argument('--no-retry-after', dest='send_retry_after', action='store_false',
+                        help="send 429s without a Retry-After header")
+    parser.add_argument('--timeout-rate', type=float, default=0, help='chance a request hangs for --hang seconds')
+    parser.add_argument('--hang', type=float, default=30)
+    parser.add_argument('--error-rate', type=float, default=0, help='chance of a 503')
+    parser.add_argument('--miss-rate', type=float, default=0.1, help='titles with no search result')
+    parser.add_argument('--no-cover-rate', type=float, default=0.15, help='volumes whose every zoom is a placeholder')
+    parser.add_argument('--undersized-rate', type=float, default=0.2,
+                        help='zooms above the best one that are too small rather than white')
+    return parser
+
+
+if __name__ == '__main__':
+    args = build_parser().parse_args()
+    base = f"http://{args.host}:{args.port}"
+    print(f"📚 Fake Google Books on {base}")
+    print(f"GOOGLE_BOOKS_API_URL={base}/books/v1/volumes")
+    print(f"GOOGLE_BOOKS_COVER_URL={base}/books/content?id={{}}&printsec=frontcover&img=1&zoom={{}}&source=gbs_api")
+    app = make_app(args)
+    try:
+        web.run_app(app, host=args.host, port=args.port, print=None)
+    finally:
+        print(json.dumps(dict(app['stats']), indent=2, sort_keys=True))
@@ -0,0 +1,148 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+here = os.path.dirname(os.path.abspath(__file__))
+data_processing = os.path.dirname(here)
+sys.path.insert(0, data_processing)
+
+from amazon_urls import fill_amazon_urls  # noqa: E402
+from client_dataset import client_frame, to_client_json  # noqa: E402
+from genre_parser import parse_genres_series  # noqa: E402
+from near_duplicates import find_duplicates  # noqa: E402
+from storage import enforce_types  # noqa: E402
+from synthetic_data import generate_catalog  # noqa: E402
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=here,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_genre_stage(workdir, client_json):
+    """Run generate_genres.py for real on a copy of the data (it is a script, not a function)."""
+    stage_dir = os.path.join(workdir, 'data-processing')
+    os.makedirs(os.path.join(workdir, 'client', 'public'), exist_ok=True)
+    os.makedirs(stage_dir, exist_ok=True)
+    with open(os.path.join(stage_dir, 'final_book_data_fixed.json'), 'w', encoding='utf-8') as f:
+        f.write(client_json)
+
+    old_cwd = os.getcwd()
+    os.chdir(stage_dir)
+    try:
+        start = time.perf_counter()
+        runpy.run_path(os.path.join(data_processing, 'generate_genres.py'), run_name='__main__')
+        return time.perf_counter() - start
+    finally:
+        os.chdir(old_cwd)
+
+
+def bench_size(n, workdir, excel_limit):
+    """Time every stage on a synthetic catalog of n rows. Returns {stage: seconds}."""
+    print(f"\n--- {n} rows ---")
+    raw = generate_catalog(n)
+    timings = {}
+
+    # Excel vs Parquet load (the stage-to-stage hand-off)
+    parquet_path = os.path.join(workdir, 'catalog.parquet')
+    enforce_types(raw).to_parquet(parquet_path, index=False)
+    _, timings['parquet_load'] = timed(pd.read_parquet, parquet_path)
+    if n <= excel_limit:
+        excel_path = os.path.join(workdir, 'catalog.xlsx')
+        raw.to_excel(excel_path, index=False)
+        _, timings['excel_load'] = timed(pd.read_excel, excel_path)
+
+    _, timings['near_duplicates'] = timed(find_duplicates, raw)
+
+    df = enforce_types(raw)
+    df['Image_URL'] = None
+
+    urls, timings['amazon_urls'] = timed(fill_amazon_urls, df)
+    df['Amazon_URL'] = urls
+    df['URL'] = urls
+
+    _, timings['genre_parse'] = timed(parse_genres_series, df['Genres'])
+
+    client_df = client_frame(df)
+    client_json, timings['json_export'] = timed(to_client_json, client_df)
+
+    # Quiet the stage's own prints while timing it
+    with open(os.devnull, 'w') as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            timings['genre_vocabulary'] = run_genre_stage(os.path.join(workdir, f'genres_{n}'), client_json)
+        finally:
+            sys.stdout = stdout
+
+    for stage, seconds in timings.items():
+        print(f"  {stage:<18} {seconds * 1000:10.1f} ms")
+    return timings
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    old = {(r['rows'], r['stage']): r['seconds'] for r in baseline['results']}
+    print(f"\n--- vs {baseline_path} ({baseline.get('commit')}) ---")
+    for r in current:
+        before = old.get((r['rows'], r['stage']))
+        if before:
+            ratio = r['seconds'] / before
+            flag = '  ⚠️ slower' if ratio > 1.2 else ''
+            print(f"  {r['rows']:>8} {r['stage']:<18} {ratio:6.2f}x{flag}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time each data-processing stage on synthetic catalogs.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--excel-limit', type=int, default=100_000,
+                        help='skip the (slow) Excel load above this many rows')
+    parser.add_argument('--out', default=None, help='results file (default: benchmarks/results/<time>.json)')
+    parser.add_argument('--compare', default=None, help='earlier results file to compare against')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bookwormed_bench_')
+    results = []
+    try:
+        for n in args.sizes:
+            for stage, seconds in bench_size(n, workdir, args.excel_limit).items():
+                results.append({'rows': n, 'stage': stage, 'seconds': round(seconds, 6)})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+    out = args.out or os.path.join(here, 'results', datetime.datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📊 Results written to {out}")
+
+    if args.compare:
+        compare(results, args.compare)
@@ -0,0 +1,101 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# --- Vocabulary the fake catalog is drawn from ---
+title_words = (
+    "the a of and night house shadow king queen city lost last secret garden war peace love "
+    "girl boy dark light fire ice blood stone river sea star road winter summer dragon "
+    "witch story life death time world heart road song wind empire daughter son café über"
+).split()
+first_names = "Jane John Mary James Toni Haruki Chimamanda Leo Agatha Isabel George Zoë Gabriel Ursula Neil".split()
+last_names = "Austen Smith Morrison Murakami Adichie Tolstoy Christie Allende Orwell Gaskell Gaiman García Brontë".split()
+genres = [
+    'Fiction', 'Classics', 'Fantasy', 'Romance', 'Young Adult', 'Historical Fiction', 'Mystery',
+    'Science Fiction', 'Thriller', 'Nonfiction', 'Literature', 'Novels', 'Horror', 'Contemporary',
+    "Children's", 'Adventure', 'Poetry', 'Biography', 'Humor', 'Graphic Novels', 'Philosophy',
+    'Self Help', 'Magic', 'Dystopia', 'Paranormal', 'Short Stories', 'Crime', 'Memoir',
+]
+
+
+def zipf_choice(rng, n_items, size, a=1.3):
+    """Indexes into a list of n_items with a Zipf-like (few very common) distribution."""
+    ranks = np.arange(1, n_items + 1)
+    p = 1.0 / ranks ** a
+    return rng.choice(n_items, size=size, p=p / p.sum())
+
+
+def generate_catalog(n, seed=0):
+    """
+    A Goodreads-shaped catalog of `n` books with the columns of goodreads_data.xlsx.
+
+    Titles repeat now and then and some carry a series suffix, authors and
+    genres are Zipf-distributed, Num_Ratings is heavy-tailed, a few
+    descriptions are missing, like in the real export.
+    """
+    rng = np.random.default_rng(seed)
+
+    def phrases(lengths, block=20_000):
+        """One string per length; words are drawn a block of rows at a time to bound memory."""
+        out = []
+        for lo in range(0, len(lengths), block):
+            part = lengths[lo:lo + block]
+            picked = [title_words[i] for i in rng.integers(0, len(title_words), size=int(part.sum())).tolist()]
+            ends = np.cumsum(part).tolist()
+            out.extend(' '.join(picked[e - k:e]) for e, k in zip(ends, part.tolist()))
+        return out
+
+    titles = [t.title() for t in phrases(rng.integers(1, 6, size=n))]
+    series = rng.random(n) < 0.15
+    for i in np.flatnonzero(series):
+        titles[i] += f" ({titles[i].split()[0]} Saga, #{rng.integers(1, 8)})"
+    dupes = np.flatnonzero(rng.random(n) < 0.02)
+    for i in dupes:
+        titles[i] = titles[rng.integers(0, n)]
+
+    n_authors = max(10, n // 8)
+    author_pool = [f"{first_names[i % len(first_names)]} {last_names[(i // len(first_names)) % len(last_names)]} {i}"
+                   for i in range(n_authors)]
+    authors = [author_pool[i] for i in zipf_choice(rng, n_authors, n, a=1.1)]
+
+    counts = rng.integers(0, 8, size=n)
+    picked = zipf_choice(rng, len(genres), int(counts.sum()))
+    ends = np.cumsum(counts).tolist()
+    genre_lists = [repr([genres[g] for g in dict.fromkeys(picked[e - k:e].tolist())])
+                   for e, k in zip(ends, counts.tolist())]
+
+    desc_len = np.clip(rng.lognormal(4.0, 0.6, size=n).astype(int), 5, 600)
+    descriptions = [d.capitalize() + '.' for d in phrases(desc_len)]
+    missing = rng.random(n) < 0.03
+    descriptions = [None if m else d for d, m in zip(descriptions, missing)]
+
+    ratings = np.clip(rng.normal(4.0, 0.3, size=n), 1.0, 5.0).round(2)
+    num_ratings = np.clip(rng.lognormal(8.5, 2.2, size=n), 0, 1e7).astype(int)
+
+    return pd.DataFrame({
+        'Unnamed: 0': np.arange(n),
+        'Book': titles,
+        'Author': authors,
+        'Description': descriptions,
+        'Genres': genre_lists,
+        'Avg_Rating': ratings,
+        'Num_Ratings': [f"{v:,}" for v in num_ratings],  # the export has thousands separators
+        'URL': [f"https://www.goodreads.com/book/show/{i}" for i in range(n)],
+    })
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic goodreads_data file.')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('--out', default='goodreads_data.xlsx', help='.xlsx or .parquet')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    df = generate_catalog(args.rows, args.seed)
+    if os.path.splitext(args.out)[1] == '.parquet':
+        df.to_parquet(args.out, index=False)
+    else:
+        df.to_excel(args.out, index=False)
+    print(f"Wrote {len(df)} rows to {args.out}")
@@ -0,0 +1,207 @@
+import json
+import struct
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from near_duplicates import fold_text
+from pipeline_state import write_if_changed
+
+# --- BM25 settings ---
+k1 = 1.2
+b = 0.75
+# Scores are stored as uint16 fractions of the largest one
+weight_levels = 65535
+
+magic = b'BM25'
+format_version = 2  # 2: stems undouble and drop a final 'e'
+# In the header, so a reader knows how to stem its queries; bump with stem()
+stemmer = 'light-suffix-v2'
+
+stopwords = frozenset("""
+a an and are as at be been but by for from had has have he her his i if in into is it its of on or
+she so that the their them they this to was were which who will with you your not no all one
+""".split())
+
+
+# --- 1. TOKENIZING ---
+@lru_cache(maxsize=200_000)
+def stem(word):
+    """
+    Light suffix stripper (no NLTK needed), roughly Porter's step 1 plus
+    -ly, -ness and -ment. After the suffix goes, a doubled final consonant
+    is undoubled and a final 'e' dropped, so inflections meet on one stem:
+    houses/house -> hous, cases/case -> cas, running/run -> run,
+    stopped/stop -> stop, stories/story -> story. Crude but consistent,
+    which is all ranking needs.
+    """
+    if len(word) <= 3:
+        return word
+    for suffix, repl in (('ies', 'y'), ('sses', 'ss'), ('ness', ''), ('ment', ''), ('ing', ''),
+                         ('edly', ''), ('eed', 'ee'), ('ed', ''), ('ly', ''), ('s', '')):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            if suffix == 's' and word.endswith(('ss', 'us', 'is')):
+                return word
+            word = word[:-len(suffix)] + repl
+            break
+    if len(word) > 3 and word[-1] == word[-2] and word[-1] not in 'aeioulsz':
+        word = word[:-1]  # runn(ing) -> run, stopp(ed) -> stop
+    elif len(word) > 3 and word.endswith('e') and not word.endswith('ee'):
+        word = word[:-1]  # house(s) -> hous, make / making -> mak
+    return word
+
+
+def tokenize(text):
+    """Folded, stop words dropped, stemmed."""
+    return [stem(w) for w in fold_text(text).split() if len(w) > 1 and w not in stopwords]
+
+
+def _is_missing(text):
+    return text is None or (not isinstance(text, str) and pd.isna(text)) or str(text).strip() in ('', 'null')
+
+
+# --- 2. BUILDING ---
+def build_bm25_index(descriptions):
+    """
+    BM25 index over a sequence of descriptions; doc ids are their positions
+    (= positions in books_full.json). 'null'/empty descriptions are skipped.
+
+    Term statistics are computed on flat NumPy arrays: every (term, doc)
+    occurrence is one integer, np.unique gives the term frequencies and the
+    document frequencies fall out of those. The full BM25 weight of every
+    posting is computed once here, so a query only adds weights up.
+    """
+    descriptions = list(descriptions)
+    doc_tokens = [[] if _is_missing(d) else tokenize(d) for d in descriptions]
+    lengths = np.fromiter((len(t) for t in doc_tokens), dtype=np.int64, count=len(doc_tokens))
+    indexed = int((lengths > 0).sum())
+
+    flat = pd.Series([w for t in doc_tokens for w in t], dtype=object)
+    term_ids, vocab = pd.factorize(flat)
+    docs = np.repeat(np.arange(len(doc_tokens), dtype=np.int64), lengths)
+
+    # Sort the vocabulary so the file can be searched by term
+    order = np.argsort(np.asarray(vocab, dtype=object).astype(str))
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    terms = [vocab[i] for i in order]
+    term_ids = rank[term_ids]
+
+    pair, tf = np.unique(term_ids * len(doc_tokens) + docs, return_counts=True)
+    p_term, p_doc = pair // len(doc_tokens), pair % len(doc_tokens)
+    df = np.bincount(p_term, minlength=len(terms))
+
+    avgdl = lengths[lengths > 0].mean() if indexed else 0.0
+    idf = np.log(1 + (indexed - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths[p_doc] / avgdl) if indexed else 1.0
+    weights = idf[p_term] * tf * (k1 + 1) / (tf + norm)
+
+    scale = float(weights.max()) if len(weights) else 1.0
+    return {
+        'k1': k1, 'b': b,
+        'num_docs': len(doc_tokens), 'num_indexed': indexed, 'avgdl': float(avgdl),
+        'terms': terms,
+        'offsets': np.r_[0, np.cumsum(df)].astype(np.uint32),
+        'doc_ids': p_doc.astype(np.uint32),  # sorted by term, then doc
+        'weights': np.round(weights / scale * weight_levels).astype(np.uint16),
+        'weight_scale': scale / weight_levels,
+    }
+
+
+# --- 3. BINARY FILE ---
+def _pad4(data):
+    return data + b'\0' * (-len(data) % 4)
+
+
+def write_bm25_index(path, index):
+    """
+    Layout (little-endian): b'BM25', uint32 version, uint32 header length,
+    JSON header (padded to 4 bytes), then the arrays listed in the header.
+    doc_ids are delta-encoded within each term. Plain typed arrays, so a JS
+    reader only needs a DataView. Returns True if the file changed.
+    """
+    offsets = index['offsets'].astype(np.int64)
+    doc_ids = index['doc_ids'].astype(np.int64)
+    first = np.zeros(len(doc_ids), dtype=bool)
+    first[offsets[:-1][offsets[:-1] < offsets[1:]]] = True
+    deltas = np.where(first, doc_ids, np.diff(doc_ids, prepend=0)).astype('<u4')
+
+    arrays = [('offsets', index['offsets'].astype('<u4')), ('doc_deltas', deltas),
+              ('weights', index['weights'].astype('<u2'))]
+    header = {key: index[key] for key in ('k1', 'b', 'num_docs', 'num_indexed', 'avgdl', 'terms', 'weight_scale')}
+    header['stemmer'] = stemmer
+    header['arrays'] = [{'name': n, 'dtype': a.dtype.str, 'length': len(a)} for n, a in arrays]
+    header_bytes = _pad4(json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    parts = [magic, struct.pack('<II', format_version, len(header_bytes)), header_bytes]
+    parts += [_pad4(a.tobytes()) for _, a in arrays]
+    return write_if_changed(path, b''.join(parts))
+
+
+class BM25Index:
+    """Loaded index with a search() method."""
+
+    def __init__(self, header, offsets, doc_ids, weights):
+        self.header = header
+        self.num_docs = header['num_docs']
+        self.terms = {t: i for i, t in enumerate(header['terms'])}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.weights = weights.astype(np.float32) * np.float32(header['weight_scale'])
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if data[:4] != magic:
+            raise ValueError(f"{path} is not a BM25 index")
+        version, header_len = struct.unpack_from('<II', data, 4)
+        if version != format_version:
+            raise ValueError(f"Unsupported BM25 index version {version}")
+        header = json.loads(data[12:12 + header_len].decode('utf-8').rstrip('\0'))
+
+        pos, arrays = 12 + header_len, {}
+        for spec in header['arrays']:
+            dtype = np.dtype(spec['dtype'])
+            arrays[spec['name']] = np.frombuffer(data, dtype=dtype, count=spec['length'], offset=pos)
+            pos += spec['length'] * dtype.itemsize
+            pos += -pos % 4
+
+        offsets = arrays['offsets'].astype(np.int64)
+        deltas = arrays['doc_deltas'].astype(np.int64)
+        # Undo the per-term delta encoding: running sum minus the sum before each term
+        running = np.cumsum(deltas)
+        before = np.r_[0, running][offsets[:-1]]
+        doc_ids = running - np.repeat(before, np.diff(offsets))
+        return cls(header, offsets, doc_ids, arrays['weights'])
+
+    def search(self, query, k=10):
+        """Top `k` (doc id, score) pairs for a free-text query, best first."""
+        ids = [self.terms[t] for t in set(tokenize(query)) if t in self.terms]
+        if not ids:
+            return []
+        docs = np.concatenate([self.doc_ids[self.offsets[i]:self.offsets[i + 1]] for i in ids])
+        weights = np.concatenate([self.weights[self.offsets[i]:self.offsets[i + 1]] for i in ids])
+        scores = np.bincount(docs, weights=weights, minlength=self.num_docs)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((top, -scores[top]))]  # best first, ties by doc id
+        return [(int(i), float(scores[i])) for i in top]
+
+
+if __name__ == '__main__':
+    import os
+    import sys
+    from json_stream import iter_json_array
+
+    public = os.path.join('..', 'client', 'public')
+    index = BM25Index.load(os.path.join(public, 'description_index.bm25'))
+    hits = index.search(' '.join(sys.argv[1:]))
+    wanted = dict(hits)
+    titles = {i: row.get('Book') for i, row in enumerate(iter_json_array(os.path.join(public, 'books_full.json')))
+              if i in wanted}
+    for doc_id, score in hits:
+        print(f"{score:7.2f}  {titles.get(doc_id)}")
@@ -1,12 +1,16 @@
-import pandas as pd
-import io
 import requests
 import time
 import os
-import itertools
 from dotenv import load_dotenv
-from PIL import Image
-from io import BytesIO
+from fetch_metrics import metrics
+from key_scheduler import KeyScheduler
+from image_probe import image_verdict_version, is_valid_image_sync
+from json_stream import write_json_atomic
+from lookup_cache import LookupCache
+from near_duplicates import dedupe_books
+from pipeline_state import book_keys, carry_over, content_hashes, describe, record_stage, write_if_changed
+from progress_journal import ProgressJournal, replay, same_book
+from storage import columnar_path, enforce_types, find_stage_input, read_table, write_table
 
 # --- 1. SETUP ---
 load_dotenv()  # Load the .env file
@@ -18,44 +22,76 @@ if not keys:
     print("❌ ERROR: No Google Books API keys found in .env file.")
     exit()
 
-key_cycle = itertools.cycle(keys)
+# Per-key token buckets: requests go to the key with the most headroom
+key_rate = float(os.getenv("GOOGLE_BOOKS_KEY_RATE", "1.0"))    # requests/sec per key
+key_burst = float(os.getenv("GOOGLE_BOOKS_KEY_BURST", "5"))
+scheduler = KeyScheduler(keys, rate=key_rate, burst=key_burst)
+# Give up on a title after this many network errors (429s don't count)
+max_lookup_errors = 3 * len(keys)
+
+# "async" fetches many books at once, "sync" is the old one-by-one loop
+fetch_mode = os.getenv("FETCH_MODE", "async").strip().lower()
+# Books in flight at once (async mode). Scales with the number of keys.
+fetch_concurrency = int(os.getenv("FETCH_CONCURRENCY", 4 * len(keys)))
+# Zoom probing in async mode: "parallel", "hedged" or "sequential"
+probe_mode = os.getenv("PROBE_MODE", "parallel").strip().lower()
+
+# Google Books endpoints. Point them at benchmarks/fake_google_books.py to
+# run offline; `cover_url` is formatted with (volume id, zoom).
+volumes_url = os.getenv("GOOGLE_BOOKS_API_URL", "https://www.googleapis.com/books/v1/volumes")
+cover_url = os.getenv("GOOGLE_BOOKS_COVER_URL",
+                      "https://books.google.com/books/content?id={}&printsec=frontcover&img=1&zoom={}&source=gbs_api")
+
+# Pooled connections for the sync path
+http = requests.Session()
+
+# On-disk cache of lookups and image verdicts, shared between runs
+# (set LOOKUP_CACHE=off to always hit the network)
+cache = None
+if os.getenv("LOOKUP_CACHE", "on").strip().lower() != "off":
+    cache = LookupCache(os.getenv("LOOKUP_CACHE_PATH", "lookup_cache.sqlite"))
 
 original_clean_file = 'updated_goodreads_data.xlsx'
 raw_file = 'goodreads_data.xlsx'
 output_json_filename = 'final_book_data_fixed.json'
 output_excel_filename = 'final_book_data.xlsx'
+# Stages hand data to each other as Parquet; the .xlsx copy is optional
+export_excel = os.getenv("EXPORT_EXCEL", "on").strip().lower() != "off"
+# Fetch metrics snapshot, rewritten every FETCH_METRICS_INTERVAL seconds during
+# the run: JSON, or the Prometheus text format if the name ends in .prom
+# (set FETCH_METRICS=off to skip it)
+metrics_path = None
+if os.getenv("FETCH_METRICS", "on").strip().lower() != "off":
+    metrics_path = os.getenv("FETCH_METRICS_PATH", "fetch_metrics.json")
+metrics_interval = float(os.getenv("FETCH_METRICS_INTERVAL", "10"))
+# Raw-file dedupe: "near" clusters title variants ("Dune (Dune #1)" / "Dune")
+# per author with MinHash/LSH, "exact" is the old drop_duplicates on Book
+dedupe_mode = os.getenv("DEDUPE_MODE", "near").strip().lower()
+duplicates_report_filename = 'duplicate_clusters.json'
+# One JSON line per fetched book; replayed on start-up to resume
+journal_filename = 'fetch_progress.jsonl'
+# Written by update_url.py (URL becomes the Amazon link) and cover_mirror.py,
+# so they stay out of this stage's changeset
+later_stage_columns = ['URL', 'Amazon_URL', 'Cover_Hash', 'Cover_Variants', 'Cover_BlurHash', 'Cover_Color']
 
 
 # --- 2. HELPER FUNCTIONS ---
 def is_valid_image(url):
     """Check if the image is valid (not a placeholder, not too small)."""
-    try:
-        r = requests.get(url, timeout=10)
-        if r.status_code != 200 or not r.headers.get("content-type", "").startswith("image"):
-            return False
-        
-        img = Image.open(BytesIO(r.content))
-        
-        # --- NEW, BETTER CHECK ---
-        # Convert to grayscale to check brightness (Luminance)
-        img_gray = img.convert('L')
-        # getextrema() returns (min, max) brightness
-        extrema_gray = img_gray.getextrema() 
-        
-        # If the darkest pixel in the image is still very bright 
-        # (e.g., > 150 on a 0-255 scale), it's a placeholder.
-        if extrema_gray[0] > 150:
-            return False
-        # --- END NEW CHECK ---
-
-        w, h = img.size
-        if w < 100 or h < 150:  # too small to be useful
-            return False
-            
-        return True
-        
-    except Exception:
-        return False
+    if cache is not None:
+        verdict = cache.get_image(url, image_verdict_version)
+        if verdict is not None:
+            return verdict
+
+    # Streams the body and stops as soon as the header shows the image is
+    # too small; the brightness check runs on a reduced-size decode.
+    # None means the probe failed (timeout/5xx) and is not cached.
+    start = time.perf_counter()
+    verdict = is_valid_image_sync(http, url)
+    metrics.observe('probe_seconds', time.perf_counter() - start)
+    if cache is not None and verdict is not None:
+        cache.put_image(url, verdict, image_verdict_version)
+    return verdict
 # def is_valid_image(url):
 #     """Check if the image is valid (not white, not too small)."""
 #     try:
@@ -76,59 +112,94 @@ def is_valid_image(url):
 
 def get_best_image(book_id):
     """Try different zoom levels to find the clearest valid image."""
-    base_url = "https://books.google.com/books/content?id={}&printsec=frontcover&img=1&zoom={}&source=gbs_api"
+    if cache is not None:
+        cached = cache.get_volume(book_id, image_verdict_version)
+        if cached is not None:
+            return cached or None
+
+    best = None
+    winner = 'none'
+    definite = True
     for zoom in range(6, 0, -1):  # try highest to lowest
-        url = base_url.format(book_id, zoom)
-        if is_valid_image(url):
-            return url
-    return None
+        url = cover_url.format(book_id, zoom)
+        verdict = is_valid_image(url)
+        if verdict:
+            best = url
+            winner = zoom
+            break
+        definite = definite and verdict is not None
+
+    metrics.count('zoom_winner', winner)
+
+    if cache is not None and definite:
+        cache.put_volume(book_id, best, image_verdict_version)
+    return best
 
 
 def get_image_url(book_title):
     """Fetch book cover image from Google Books API, safely handling rate limits."""
-    for attempt in range(len(keys)):  # Try each key once
-        api_key = next(key_cycle)
-        url = "https://www.googleapis.com/books/v1/volumes"
+    if cache is not None:
+        hit = cache.get_lookup(book_title)
+        if hit is not None:
+            return pick_image(hit.get('volume_id'), hit.get('thumbnail'))
+
+    errors = 0
+
+    while True:
+        # Waits only if every key is out of tokens or backing off
+        start = time.perf_counter()
+        api_key = scheduler.acquire()
+        metrics.waited(time.perf_counter() - start)
+        metrics.key_event(scheduler.label(api_key), 'requests')
         params = {'q': f'intitle:{book_title}', 'key': api_key, 'maxResults': 1}
 
+        start = time.perf_counter()
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = http.get(volumes_url, params=params, timeout=10)
 
-            # Handle rate limit
+            # Handle rate limit: back off this key only
             if response.status_code == 429:
-                print(f"⚠️ Key {attempt+1}/{len(keys)} hit rate limit. Trying next key...")
-                time.sleep(10)
-                continue  # Try the next key
+                metrics.key_event(scheduler.label(api_key), '429')
+                delay = scheduler.penalize(api_key, response.headers.get("Retry-After"))
+                print(f"⚠️ {scheduler.label(api_key)} hit rate limit. Resting it for {delay:.0f}s...")
+                continue
 
             response.raise_for_status()
+            metrics.observe('lookup_seconds', time.perf_counter() - start)
+            scheduler.report_success(api_key)
             data = response.json()
+            break
 
-            if 'items' in data and len(data['items']) > 0:
-                volume = data['items'][0]
-                volume_info = volume.get('volumeInfo', {})
+        except requests.exceptions.RequestException as e:
+            print(f"  Error fetching '{book_title}' with {scheduler.label(api_key)}: {e}")
+            metrics.key_event(scheduler.label(api_key), 'errors')
+            scheduler.penalize(api_key, 5)
+            errors += 1
+            if errors >= max_lookup_errors:
+                return None
 
-                # Try to get the clearest version
-                book_id = volume.get('id')
-                if book_id:
-                    best_img = get_best_image(book_id)
-                    if best_img:
-                        return best_img
+    book_id, thumbnail = None, None
+    if 'items' in data and len(data['items']) > 0:
+        volume = data['items'][0]
+        book_id = volume.get('id')
+        thumbnail = volume.get('volumeInfo', {}).get('imageLinks', {}).get('thumbnail')
 
-                # fallback: thumbnail if zoom versions fail
-                if 'imageLinks' in volume_info and 'thumbnail' in volume_info['imageLinks']:
-                    return volume_info['imageLinks']['thumbnail']
+    if cache is not None:
+        cache.put_lookup(book_title, book_id, thumbnail)
+    return pick_image(book_id, thumbnail)
 
-            return None
 
-        except requests.exceptions.RequestException as e:
-            print(f"  Error fetching '{book_title}' with key {attempt+1}: {e}")
-            time.sleep(5)
-            continue  # Try next key
+def pick_image(book_id, thumbnail):
+    """Clearest zoom version if there is one, else the search thumbnail."""
+    if book_id:
+        best_img = get_best_image(book_id)
+        if best_img:
+            metrics.count('image_source', 'zoom')
+            return best_img
 
-    # If all keys failed due to rate limit -> wait and retry
-    print("😴 All keys rate-limited. Waiting 5 minutes before retrying...")
-    time.sleep(900) # Wait 15 (900 sec) for a test
-    return get_image_url(book_title)  # Try again after cooldown
+    # fallback: thumbnail if zoom versions fail
+    metrics.count('image_source', 'thumbnail' if thumbnail else 'none')
+    return thumbnail
 
 
 # --- 3. MAIN SCRIPT ---
@@ -136,21 +207,48 @@ try:
     print(f"✅ Loaded {len(keys)} API key(s).")
 
     # --- Step 1: Load Data ---
-    if os.path.exists(output_excel_filename):
-        print(f"Loading existing progress file: '{output_excel_filename}'")
-        df = pd.read_excel(output_excel_filename)
-    elif os.path.exists(original_clean_file):
-        print(f"Loading cleaned file: '{original_clean_file}'")
-        df = pd.read_excel(original_clean_file)
+    # Parquet copies are preferred; Excel is only parsed when there is none
+    progress_file = find_stage_input(output_excel_filename)
+    clean_file = find_stage_input(original_clean_file)
+    source_file = clean_file or (raw_file if os.path.exists(raw_file) else None)
+    # Source edited after the last run -> reload it and keep the old results
+    source_changed = bool(progress_file and source_file
+                          and os.path.getmtime(source_file) > os.path.getmtime(progress_file))
+
+    if progress_file and not source_changed:
+        print(f"Loading existing progress file: '{progress_file}'")
+        df = read_table(progress_file)
+    elif clean_file:
+        print(f"Loading cleaned file: '{clean_file}'")
+        df = read_table(clean_file)
         df['Image_URL'] = None
     else:
         print(f"No clean file found. Loading and cleaning '{raw_file}'...")
-        df = pd.read_excel(raw_file)
+        df = read_table(raw_file)
         df['Description'] = df['Description'].fillna('null')
-        df = df.drop_duplicates(subset=['Book'], keep='first')
+        if dedupe_mode == "exact":
+            df = df.drop_duplicates(subset=['Book'], keep='first')
+        else:
+            # One row per cluster: the most-rated variant is kept
+            rows_before = len(df)
+            df, clusters, report = dedupe_books(df)
+            write_json_atomic(duplicates_report_filename, report, ensure_ascii=False, indent=2)
+            print(f"🧬 Merged {rows_before - len(df)} near-duplicate rows into {len(report)} books "
+                  f"(see '{duplicates_report_filename}')")
         df['Image_URL'] = None
         df = df.reset_index(drop=True)
 
+    if source_changed:
+        # Only added books and books whose title/author changed are fetched again
+        previous = read_table(progress_file)
+        reused = carry_over(df, previous, 'Image_URL')
+        print(f"♻️ '{source_file}' changed: reusing {reused} results, {len(df) - reused} book(s) to fetch")
+        # Columns added by later stages (Amazon_URL, Cover_* from update_url and
+        # cover_mirror) are kept for unchanged books instead of being dropped
+        for column in previous.columns.difference(df.columns):
+            carry_over(df, previous, column)
+    df = enforce_types(df)
+
     # --- ADD AMAZON SEARCH URL COLUMN ---
     # def make_amazon_url(title, author):
     #     if pd.isna(title):
@@ -169,13 +267,23 @@ try:
     #     axis=1
     # )
 
+    # --- Step 1b: Replay the progress journal from earlier runs ---
+    replayed = 0
+    for index, (book, url) in replay(journal_filename).items():
+        # Only trust rows that still hold the same book
+        if index in df.index and same_book(df.at[index, 'Book'], book):
+            df.at[index, 'Image_URL'] = url
+            replayed += 1
+    if replayed:
+        print(f"↩️ Restored {replayed} results from '{journal_filename}'")
+
     # --- Step 2: Filter Unprocessed Rows ---
     
     # === MODIFIED THIS LINE ===
     to_process = df[df['Image_URL'].isnull()]
     # ==========================
     
-    if len(to_process) == 0:
+    if len(to_process) == 0 and not replayed and not source_changed:
         print("✅ All books already processed. Exiting.")
         exit()
 
@@ -183,31 +291,68 @@ try:
     print(f"Total books to process: {len(to_process)}")
 
     # --- Step 3: Loop and Fetch Images ---
-    for count, index in enumerate(to_process.index, start=1):
-        title = df.at[index, 'Book']
-        print(f"Processing book {count}/{len(to_process)}: {title}")
+    done = 0
+    journal = ProgressJournal(journal_filename)
+    if metrics_path:
+        metrics.start_export(metrics_path, metrics_interval)
 
-        url = get_image_url(title)
+    def record_result(index, url):
+        """Store one finished book and append it to the progress journal."""
+        global done
+        done += 1
 
         if url:
             df.at[index, 'Image_URL'] = url
-            print("  ✅ Found clear image URL.")
+            print(f"  ✅ [{done}/{len(to_process)}] Found clear image URL: {df.at[index, 'Book']}")
         else:
             df.at[index, 'Image_URL'] = 'NOT_FOUND'
-            print("  ⚠️ URL not found.")
+            print(f"  ⚠️ [{done}/{len(to_process)}] URL not found: {df.at[index, 'Book']}")
+
+        # One small line per book instead of rewriting the workbook
+        journal.append(index, df.at[index, 'Book'], df.at[index, 'Image_URL'])
+
+    if fetch_mode == "async":
+        import asyncio
+        from async_fetcher import fetch_all
+
+        print(f"⚡ Async mode: up to {fetch_concurrency} books in flight, {probe_mode} zoom probing.")
+        titles = [(index, df.at[index, 'Book']) for index in to_process.index]
+        asyncio.run(fetch_all(titles, scheduler, record_result,
+                              concurrency=fetch_concurrency, probe_mode=probe_mode, cache=cache))
+    else:
+        for count, index in enumerate(to_process.index, start=1):
+            title = df.at[index, 'Book']
+            print(f"Processing book {count}/{len(to_process)}: {title}")
 
-        # Delay to prevent hitting per-second limits
-        time.sleep(2.5)
+            # Per-second pacing is handled by the key scheduler
+            record_result(index, get_image_url(title))
 
-        # Save progress every 50 books (won't be hit in this test)
-        if count % 50 == 0:
-            print(f"\n--- 💾 Saving progress after {count} books ---\n")
-            df.to_excel(output_excel_filename, index=False)
+    journal.close()
+    metrics.stop_export()
 
     # --- Step 4: Final Save ---
     print("\nImage fetching complete for test run. Final save...")
-    df.to_excel(output_excel_filename, index=False)
-    df.to_json(output_json_filename, orient='records', indent=4)
+    if export_excel:
+        df.to_excel(output_excel_filename, index=False)
+    # Written after the Excel copy so it counts as the newer one
+    write_table(df, columnar_path(output_excel_filename))
+    # Left untouched when nothing changed, so downstream caches stay valid
+    write_if_changed(output_json_filename, df.to_json(orient='records', indent=4))
+
+    # Source columns plus Image_URL: only what this stage owns
+    owned_columns = [c for c in df.columns if c not in later_stage_columns]
+    changes = record_stage('clean_data', book_keys(df), content_hashes(df, owned_columns))
+    print(f"🧾 Changes since last run: {describe(changes)} (see changesets/clean_data.json)")
+
+    # The exports now hold every result, so the journal can start over
+    journal.clear()
+    journal.close()
+
+    if cache is not None:
+        print(cache.report())
+    print(f"📈 Fetch metrics: {metrics.summary()}")
+    if metrics_path:
+        print(f"   (full snapshot in '{metrics_path}')")
 
     print("\n🎉 Test run complete!")
 
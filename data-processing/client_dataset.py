@@ -0,0 +1,177 @@
+import gzip
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from amazon_urls import fill_amazon_urls
+from genre_parser import parse_genres_series
+from json_stream import write_bytes_atomic, write_json_atomic
+
+# Columns shipped to client/public/books_full.json, in this order
+client_columns = ['Book', 'Author', 'Description', 'Genres', 'Avg_Rating', 'Num_Ratings', 'Image_URL', 'URL', 'Amazon_URL',
+                  'Cover_Variants', 'Cover_BlurHash', 'Cover_Color']
+
+
+def add_urls(df):
+    """Fill Amazon_URL where missing and copy it into URL (the client links to Amazon)."""
+    df['Amazon_URL'] = fill_amazon_urls(df)
+    df['URL'] = df['Amazon_URL']
+    return df
+
+
+def client_frame(df):
+    """Select and reorder the client columns, with Genres as real lists."""
+    client_df = df[[c for c in client_columns if c in df.columns]].copy()
+    if 'Genres' in client_df.columns:
+        # Normalized to a real JSON array; each distinct string is parsed once
+        client_df['Genres'] = parse_genres_series(client_df['Genres'])
+    if 'Cover_Variants' in client_df.columns:
+        # Mirrored cover files (see cover_mirror.py) as an object, not a string
+        client_df['Cover_Variants'] = client_df['Cover_Variants'].map(
+            lambda v: json.loads(v) if isinstance(v, str) else None).astype(object)
+    return client_df
+
+
+def to_client_json(client_df):
+    return client_df.to_json(orient='records', force_ascii=False, indent=2)
+
+
+def process_shard(shard):
+    """All per-row work for one block of rows. Returns (url columns, client JSON text)."""
+    shard = add_urls(shard.copy())
+    return shard[['Amazon_URL', 'URL']], to_client_json(client_frame(shard))
+
+
+def merge_json_arrays(parts):
+    """
+    Join the texts of several `to_json(orient='records', indent=2)` arrays
+    into exactly what one call over all rows would have produced.
+    """
+    bodies = [p[2:-2] for p in parts if p.strip() != '[\n\n]']
+    if not bodies:
+        return parts[0] if parts else '[\n\n]'
+    return '[\n' + ',\n'.join(bodies) + '\n]'
+
+
+def build_client_dataset(df, workers=1):
+    """
+    Add the URL columns to `df` and return the books_full.json text.
+
+    With workers > 1 the frame is cut into contiguous row shards that run in
+    a process pool; the results are put back together in shard order, so the
+    output is byte-identical to the single-core run.
+    """
+    if workers <= 1 or len(df) < 2 * workers:
+        df = add_urls(df)
+        return df, to_client_json(client_frame(df))
+
+    # A few shards per worker keeps the pool busy if some shards are slower
+    bounds = np.linspace(0, len(df), workers * 4 + 1, dtype=int)
+    shards = [df.iloc[a:b] for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(process_shard, shards))  # map keeps shard order
+
+    urls = pd.concat([u for u, _ in results])
+    df['Amazon_URL'] = urls['Amazon_URL']
+    df['URL'] = urls['URL']
+    return df, merge_json_arrays([text for _, text in results])
+
+
+def default_workers(env_var="UPDATE_URL_WORKERS", default=1):
+    """Worker count from `env_var` (UPDATE_URL_WORKERS by default); 0 means one per CPU."""
+    workers = int(os.getenv(env_var, str(default)))
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+# --- Sharded export ---
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _write_bytes(path, data):
+    # Shard names contain their content hash, so an existing file of the right
+    # size is already right; anything else (e.g. cut short by a crash) is rewritten
+    if os.path.exists(path) and os.path.getsize(path) == len(data):
+        return
+    write_bytes_atomic(path, data, only_if_changed=False)
+
+
+def export_client_shards(client_df, out_dir, shard_size=2000, prefix='books'):
+    """
+    Write the client dataset as minified shards ordered by popularity.
+
+    Rows are sorted by Num_Ratings (most rated first) and cut into shards of
+    `shard_size`. Every record keeps an `id`: its position in books_full.json,
+    which is what genre_index.json refers to. Each shard is written as
+    `<prefix>-<n>.<hash>.json` plus `.gz` and (if brotli is installed) `.br`
+    siblings; the content hash in the name makes it safe to cache forever.
+    `manifest.json` lists the shards in order with their ranges and hashes,
+    so the client only needs the manifest and shard 0 for the first render.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    ordered = client_df.reset_index(drop=True)
+    ordered.insert(0, 'id', np.arange(len(ordered)))
+    if 'Num_Ratings' in ordered.columns:
+        ordered = ordered.sort_values('Num_Ratings', ascending=False, kind='stable', na_position='last')
+
+    shards = []
+    keep = {'manifest.json'}
+    for n, start in enumerate(range(0, len(ordered), shard_size)):
+        part = ordered.iloc[start:start + shard_size]
+        data = part.to_json(orient='records', force_ascii=False).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        name = f"{prefix}-{n:04d}.{digest[:12]}.json"
+
+        gz = gzip.compress(data, compresslevel=9, mtime=0)  # mtime=0: same input, same bytes
+        _write_bytes(os.path.join(out_dir, name), data)
+        _write_bytes(os.path.join(out_dir, name + '.gz'), gz)
+        keep.update({name, name + '.gz'})
+
+        entry = {
+            'file': name,
+            'start': start,
+            'end': start + len(part),
+            'count': len(part),
+            'sha256': digest,
+            'bytes': len(data),
+            'gzip_bytes': len(gz),
+        }
+        if brotli is not None:
+            br = brotli.compress(data, quality=11)
+            _write_bytes(os.path.join(out_dir, name + '.br'), br)
+            keep.add(name + '.br')
+            entry['brotli_bytes'] = len(br)
+        if 'Num_Ratings' in part.columns:
+            ratings = part['Num_Ratings'].dropna()
+            if len(ratings):
+                entry['num_ratings_max'] = int(ratings.max())
+                entry['num_ratings_min'] = int(ratings.min())
+        shards.append(entry)
+
+    if brotli is None:
+        print("⚠️ brotli not installed, skipped .br shards")
+
+    manifest = {
+        'version': 1,
+        'total': len(ordered),
+        'shard_size': shard_size,
+        'order': 'Num_Ratings desc',
+        'columns': list(ordered.columns),
+        'shards': shards,
+    }
+    write_json_atomic(os.path.join(out_dir, 'manifest.json'), manifest, ensure_ascii=False, indent=2)
+
+    # Drop shards from earlier exports that the new manifest no longer lists
+    for name in os.listdir(out_dir):
+        if name.startswith(prefix + '-') and name not in keep:
+            os.remove(os.path.join(out_dir, name))
+
+    return manifest
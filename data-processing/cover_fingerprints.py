@@ -0,0 +1,155 @@
+import argparse
+import asyncio
+import json
+import os
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from cover_hash import PlaceholderLibrary, from_hex, hamming, image_hashes, shared_cover_groups, to_hex
+from image_probe import decode_pool
+from json_stream import write_json_atomic
+from pipeline_state import book_keys
+from storage import find_stage_input, read_table
+
+# --- Same file names as clean_data.py ---
+input_excel_filename = 'final_book_data.xlsx'
+# Cover URL -> [phash, dhash]; only new URLs are downloaded on the next run
+hashes_filename = 'cover_hashes.json'
+report_filename = 'cover_report.json'
+concurrency = int(os.getenv("COVER_FETCH_CONCURRENCY", "16"))
+# A picture used by this many different books is almost surely a placeholder
+learn_min_books = int(os.getenv("PLACEHOLDER_MIN_BOOKS", "5"))
+
+
+# --- 1. HASHING ---
+def hash_bytes(content):
+    """(phash, dhash) of an image body; decoded at reduced size, 32x32 is all the hashes need."""
+    img = Image.open(BytesIO(content))
+    img.draft('L', (64, 64))
+    return image_hashes(img)
+
+
+def load_bytes(source):
+    if source.startswith(('http://', 'https://')):
+        import requests
+        r = requests.get(source, timeout=10)
+        r.raise_for_status()
+        return r.content
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+async def fetch_hashes(urls):
+    """{url: (phash, dhash)} for every URL that downloads and decodes."""
+    import aiohttp
+
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    results = {}
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+
+        async def one(url):
+            async with semaphore:
+                try:
+                    async with session.get(url, timeout=aiohttp.ClientTimeout(total=15)) as r:
+                        if r.status != 200:
+                            return
+                        body = await r.read()
+                    results[url] = await loop.run_in_executor(decode_pool, hash_bytes, body)
+                except Exception as e:
+                    print(f"  ⚠️ Could not hash {url}: {e}")
+
+        await asyncio.gather(*(one(url) for url in urls))
+    return results
+
+
+def load_known_hashes():
+    if not os.path.exists(hashes_filename):
+        return {}
+    with open(hashes_filename, 'r', encoding='utf-8') as f:
+        return {url: (from_hex(p), from_hex(d)) for url, (p, d) in json.load(f).items()}
+
+
+# --- 2. MAIN ---
+def main():
+    parser = argparse.ArgumentParser(description='Fingerprint cover images: placeholders and shared covers.')
+    parser.add_argument('--add-placeholder', metavar='FILE_OR_URL',
+                        help='add this image to placeholder_hashes.json and exit')
+    parser.add_argument('--name', default=None, help='name for --add-placeholder')
+    parser.add_argument('--learn-placeholders', action='store_true',
+                        help=f'add covers shared by >= PLACEHOLDER_MIN_BOOKS ({learn_min_books}) books to the library')
+    args = parser.parse_args()
+
+    library = PlaceholderLibrary.load()
+
+    if args.add_placeholder:
+        p, d = hash_bytes(load_bytes(args.add_placeholder))
+        library.add(args.name or os.path.basename(args.add_placeholder), p, d)
+        library.save()
+        print(f"✅ Added placeholder {to_hex(p)} / {to_hex(d)} ({len(library.entries)} known)")
+        return
+
+    input_file = find_stage_input(input_excel_filename)
+    if not input_file:
+        print(f"❌ ERROR: '{input_excel_filename}' not found. Run clean_data.py first.")
+        return
+    print(f"Loading: {input_file}")
+    df = read_table(input_file)
+
+    # --- Step 1: Hash every cover not seen before ---
+    urls = df['Image_URL'].astype('string')
+    has_cover = urls.str.startswith('http').fillna(False)
+    known = load_known_hashes()
+    todo = sorted(set(urls[has_cover]) - set(known))
+    print(f"🖼️ {int(has_cover.sum())} covers, {len(todo)} new to hash")
+    if todo:
+        known.update(asyncio.run(fetch_hashes(todo)))
+        write_json_atomic(hashes_filename, {u: [to_hex(p), to_hex(d)] for u, (p, d) in known.items()},
+                          separators=(',', ':'))
+
+    rows = df[has_cover & urls.isin(known)]
+    keys = book_keys(rows)
+    phashes = np.array([known[u][0] for u in rows['Image_URL']], dtype=np.uint64)
+    dhashes = np.array([known[u][1] for u in rows['Image_URL']], dtype=np.uint64)
+
+    def describe_row(i, **extra):
+        return {'Book': rows['Book'].iat[i], 'Author': rows['Author'].iat[i] if 'Author' in rows.columns else None,
+                'Image_URL': rows['Image_URL'].iat[i], 'phash': to_hex(phashes[i]), **extra}
+
+    # --- Step 2: Known placeholders that slipped through ---
+    placeholders = []
+    if library.entries:
+        close = ((hamming(phashes[:, None], library.phashes[None, :]) <= library.distance)
+                 & (hamming(dhashes[:, None], library.dhashes[None, :]) <= library.distance))
+        for i in np.flatnonzero(close.any(axis=1)):
+            placeholders.append(describe_row(i, match=library.entries[int(np.argmax(close[i]))]['name']))
+
+    # --- Step 3: One picture used by different books ---
+    shared, learned = [], 0
+    for group in shared_cover_groups(phashes):
+        n_books = keys.iloc[group].nunique()
+        if n_books < 2:
+            continue
+        likely_placeholder = n_books >= learn_min_books
+        shared.append({'books': n_books, 'likely_placeholder': likely_placeholder,
+                       'covers': [describe_row(i) for i in group]})
+        if likely_placeholder and args.learn_placeholders and library.match(phashes[group[0]], dhashes[group[0]]) is None:
+            library.add(f"learned-{to_hex(phashes[group[0]])}", phashes[group[0]], dhashes[group[0]])
+            learned += 1
+    shared.sort(key=lambda g: -g['books'])
+
+    if learned:
+        library.save()
+        print(f"🧠 Learned {learned} placeholder(s); they are rejected by clean_data.py from now on")
+
+    write_json_atomic(report_filename, {'placeholders': placeholders, 'shared_covers': shared},
+                      ensure_ascii=False, indent=2)
+    print(f"✅ {len(placeholders)} placeholder cover(s), {len(shared)} cover(s) shared by different books "
+          f"(see '{report_filename}')")
+
+
+if __name__ == '__main__':
+    main()
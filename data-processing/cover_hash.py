@@ -0,0 +1,172 @@
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+from near_duplicates import find_root, union
+
+# Known placeholder covers ("image not available" cards etc.) as 64-bit
+# pHash/dHash hex strings. Add new ones with `python cover_fingerprints.py --add-placeholder`.
+placeholder_library_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'placeholder_hashes.json')
+# Max differing bits (of 64) for two covers to count as the same picture
+placeholder_distance = 10
+duplicate_distance = 6
+# A grayscale cover this flat is blank whatever its brightness
+blank_std = 4.0
+
+
+# --- 1. HASHES ---
+def _dct_matrix(n):
+    k = np.arange(n)
+    m = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n)) * np.sqrt(2 / n)
+    m[0] /= np.sqrt(2)
+    return m.astype(np.float32)
+
+
+_dct32 = _dct_matrix(32)
+
+
+def _pack(bits):
+    """(N, 64) booleans -> (N,) uint64, first bit most significant."""
+    return np.packbits(bits.astype(np.uint8), axis=1).view('>u8').ravel().astype(np.uint64)
+
+
+def dhash(pixels):
+    """(N, 8, 9) grayscale -> (N,) uint64: is each pixel brighter than its right neighbour."""
+    pixels = np.asarray(pixels, dtype=np.float32)
+    return _pack((pixels[:, :, :-1] > pixels[:, :, 1:]).reshape(len(pixels), 64))
+
+
+def phash(pixels):
+    """(N, 32, 32) grayscale -> (N,) uint64: 8x8 low DCT frequencies above their median (DC skipped)."""
+    pixels = np.asarray(pixels, dtype=np.float32)
+    coeffs = np.einsum('ij,njk,lk->nil', _dct32, pixels, _dct32)[:, :8, :8].reshape(len(pixels), 64)
+    median = np.median(coeffs[:, 1:], axis=1, keepdims=True)
+    return _pack(coeffs > median)
+
+
+def gray_thumbnails(img):
+    """The two small grayscale versions the hashes are computed from."""
+    gray = img.convert('L')
+    return (np.asarray(gray.resize((32, 32), Image.BILINEAR), dtype=np.float32),
+            np.asarray(gray.resize((9, 8), Image.BILINEAR), dtype=np.float32))
+
+
+def image_hashes(img):
+    """(phash, dhash) of one PIL image as Python ints."""
+    p32, d9 = gray_thumbnails(img)
+    return int(phash(p32[None])[0]), int(dhash(d9[None])[0])
+
+
+def _popcount(x):
+    """Set bits per uint64. np.bitwise_count is NumPy >= 2.0; older ones unpack the bytes."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(x)
+    x = np.array(x, dtype=np.uint64, order='C')  # view() needs contiguous bytes; keeps 0-d shapes
+    return np.unpackbits(x.reshape(x.shape + (1,)).view(np.uint8), axis=-1).sum(axis=-1, dtype=np.uint8)
+
+
+def hamming(a, b):
+    """Differing bits between uint64 hashes, broadcasting like any NumPy op."""
+    return _popcount(np.bitwise_xor(np.asarray(a, dtype=np.uint64), np.asarray(b, dtype=np.uint64)))
+
+
+def to_hex(h):
+    return f"{int(h):016x}"
+
+
+def from_hex(s):
+    return int(s, 16)
+
+
+# --- 2. PLACEHOLDER LIBRARY ---
+class PlaceholderLibrary:
+    """Known placeholder hashes; a cover within `distance` bits on both hashes is one of them."""
+
+    def __init__(self, entries=(), distance=placeholder_distance):
+        self.entries = list(entries)
+        self.distance = distance
+        self.phashes = np.array([from_hex(e['phash']) for e in self.entries], dtype=np.uint64)
+        self.dhashes = np.array([from_hex(e['dhash']) for e in self.entries], dtype=np.uint64)
+
+    @classmethod
+    def load(cls, path=placeholder_library_path, distance=placeholder_distance):
+        if not os.path.exists(path):
+            return cls(distance=distance)
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f), distance)
+
+    def match(self, p, d):
+        """Name of the matching placeholder, or None."""
+        if not self.entries:
+            return None
+        hit = (hamming(self.phashes, p) <= self.distance) & (hamming(self.dhashes, d) <= self.distance)
+        return self.entries[int(np.argmax(hit))]['name'] if hit.any() else None
+
+    def add(self, name, p, d):
+        self.entries.append({'name': name, 'phash': to_hex(p), 'dhash': to_hex(d)})
+        self.__init__(self.entries, self.distance)
+
+    def save(self, path=placeholder_library_path):
+        from json_stream import write_json_atomic
+        write_json_atomic(path, self.entries, indent=2)
+
+
+def placeholder_reason(img, library):
+    """
+    'blank' or the library entry's name if `img` is a placeholder, else None.
+
+    Replaces "darkest pixel brighter than 150": pale covers with some
+    structure pass, and placeholder cards with dark text are caught by hash.
+    """
+    gray = img.convert('L')
+    if np.asarray(gray, dtype=np.float32).std() < blank_std:  # on the full (already reduced) image
+        return 'blank'
+    p32, d9 = gray_thumbnails(gray)
+    return library.match(int(phash(p32[None])[0]), int(dhash(d9[None])[0]))
+
+
+# --- 3. SHARED COVERS ---
+def shared_cover_groups(phashes, distance=duplicate_distance):
+    """
+    Groups (lists of positions) of covers within `distance` bits of each other.
+
+    Multi-index hashing: the 64 bits are cut into distance + 1 bands, and two
+    hashes that close must agree exactly on at least one band (pigeonhole),
+    so only rows sharing a band value are compared. Groups are closed
+    transitively with a union-find.
+    """
+    # Identical hashes (a placeholder used by thousands of books) collapse first
+    phashes, inverse = np.unique(np.asarray(phashes, dtype=np.uint64), return_inverse=True)
+    inverse = inverse.ravel()
+    n = len(phashes)
+    parent = np.arange(n)
+
+    bands = distance + 1
+    edges = np.linspace(0, 64, bands + 1, dtype=int)
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        mask = np.uint64((1 << (hi - lo)) - 1)
+        band = (phashes >> np.uint64(64 - hi)) & mask
+        order = np.argsort(band, kind='stable')
+        sorted_band = band[order]
+        starts = np.flatnonzero(np.r_[True, sorted_band[1:] != sorted_band[:-1]])
+        for a, b in zip(starts, np.r_[starts[1:], n]):
+            members = order[a:b]
+            if len(members) < 2:
+                continue
+            if len(members) > 512:
+                # Too big to compare all pairs: link to the first member only
+                close = np.flatnonzero(hamming(phashes[members], phashes[members[0]]) <= distance)
+                for i in close[1:]:
+                    union(parent, members[0], members[i])
+                continue
+            close = hamming(phashes[members][:, None], phashes[members][None, :]) <= distance
+            for i, j in zip(*np.nonzero(np.triu(close, 1))):
+                union(parent, members[i], members[j])
+
+    roots = np.array([find_root(parent, i) for i in range(n)])[inverse]
+    groups = {}
+    for i, r in enumerate(roots.tolist()):
+        groups.setdefault(r, []).append(i)
+    return [g for g in groups.values() if len(g) > 1]
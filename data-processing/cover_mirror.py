@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from PIL import Image, features
+
+from client_dataset import default_workers
+from cover_preview import cover_preview
+from json_stream import write_bytes_atomic, write_json_atomic
+from storage import columnar_path, find_stage_input, read_table, write_table
+
+# --- Same file names as clean_data.py ---
+input_excel_filename = 'final_book_data.xlsx'
+client_public_path = os.path.join('..', 'client', 'public')
+# Covers live under client/public/covers/<first 2 hex>/<sha256>..., served as /covers/...
+covers_dir = 'covers'
+# Image_URL -> what was stored for it; URLs in here aren't downloaded again
+manifest_filename = 'cover_mirror.json'
+widths = [int(w) for w in os.getenv("COVER_WIDTHS", "96,200,400").split(",")]
+formats = [f.strip().lower() for f in os.getenv("COVER_FORMATS", "webp,avif").split(",") if f.strip()]
+concurrency = int(os.getenv("COVER_FETCH_CONCURRENCY", "16"))
+quality = {'webp': 80, 'avif': 55}
+export_excel = os.getenv("EXPORT_EXCEL", "on").strip().lower() != "off"
+
+
+# --- 1. VARIANTS AND PREVIEWS (run in worker processes) ---
+def content_path(sha, suffix):
+    """'covers/ab/ab12...<suffix>', relative to client/public."""
+    return '/'.join([covers_dir, sha[:2], sha + suffix])
+
+
+def make_variants(img, sha, public_path, widths, formats):
+    """
+    Resized copies of one decoded cover, as {width: {format: [path, bytes]}}.
+
+    Covers are only scaled down: widths above the original's are skipped.
+    Files that already exist are content-addressed and therefore already
+    right, so they're only measured.
+    """
+    variants = {}
+    for width in sorted(widths, reverse=True):
+        if width > img.width or not formats:
+            continue
+        height = max(1, round(img.height * width / img.width))
+        resized = None
+        variants[str(width)] = {}
+        for fmt in formats:
+            path = content_path(sha, f'-{width}.{fmt}')
+            full = os.path.join(public_path, path)
+            if not os.path.exists(full):
+                if resized is None:
+                    resized = img.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+                buf = BytesIO()
+                resized.save(buf, fmt.upper(), quality=quality.get(fmt, 80))
+                os.makedirs(os.path.dirname(full), exist_ok=True)
+                # Two books can share a cover; each write goes through its own temp file
+                write_bytes_atomic(full, buf.getvalue(), only_if_changed=False)
+            variants[str(width)][fmt] = ['/' + path, os.path.getsize(full)]
+    return variants
+
+
+def process_cover(original, sha, public_path, widths, formats):
+    """Variants plus BlurHash and dominant colour, from one decode of the stored original."""
+    img = Image.open(os.path.join(public_path, original))
+    # JPEG decodes at 1/2, 1/4 or 1/8 scale when that still covers the largest width
+    img.draft('RGB', (max(widths), 1))
+    img = img.convert('RGB')
+    return {'variants': make_variants(img, sha, public_path, widths, formats), **cover_preview(img)}
+
+
+# --- 2. MIRRORING ---
+def store_original(body):
+    """Save downloaded bytes under their SHA-256. Returns (sha, relative path)."""
+    sha = hashlib.sha256(body).hexdigest()
+    fmt = (Image.open(BytesIO(body)).format or 'bin').lower()
+    path = content_path(sha, '.' + ('jpg' if fmt == 'jpeg' else fmt))
+    full = os.path.join(client_public_path, path)
+    if not os.path.exists(full):
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        write_bytes_atomic(full, body, only_if_changed=False)
+    return sha, path
+
+
+async def mirror_covers(urls, pool, usable_formats, known=None):
+    """
+    {url: entry} for every URL that downloads and decodes. Downloads run
+    `concurrency` at a time; each stored original is resized in `pool`
+    while the next covers download. URLs whose original is already stored
+    (in `known`, the manifest) are processed again without downloading.
+    """
+    known = known or {}
+    import aiohttp
+
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    results = {}
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+
+        async def one(url):
+            entry = known.get(url)
+            if entry and os.path.exists(os.path.join(client_public_path, entry['original'][0].lstrip('/'))):
+                sha, original, size = entry['sha256'], entry['original'][0].lstrip('/'), entry['original'][1]
+            else:
+                sha, original, size = await download(url)
+                if sha is None:
+                    return
+            try:
+                processed = await loop.run_in_executor(pool, process_cover, original, sha, client_public_path,
+                                                       widths, usable_formats)
+            except Exception as e:
+                print(f"  ⚠️ Could not resize {url}: {e}")
+                return
+            results[url] = {'sha256': sha, 'original': ['/' + original, size], 'formats': usable_formats, **processed}
+
+        async def download(url):
+            async with semaphore:
+                try:
+                    async with session.get(url, timeout=aiohttp.ClientTimeout(total=15)) as r:
+                        if r.status != 200:
+                            return None, None, None
+                        body = await r.read()
+                    # Hashing, the header decode and the file write stay off the event loop
+                    return await loop.run_in_executor(None, store_original, body) + (len(body),)
+                except Exception as e:
+                    print(f"  ⚠️ Could not mirror {url}: {e}")
+                    return None, None, None
+
+        await asyncio.gather(*(one(url) for url in urls))
+    return results
+
+
+def load_manifest():
+    if not os.path.exists(manifest_filename):
+        return {}
+    with open(manifest_filename, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def is_complete(entry, usable_formats):
+    """All files of a manifest entry exist, in every format now wanted, and it has a preview."""
+    if 'blurhash' not in entry or set(usable_formats) - set(entry.get('formats', [])):
+        return False
+    files = [entry['original'][0]] + [path for by_fmt in entry['variants'].values() for path, _ in by_fmt.values()]
+    if any(set(usable_formats) - set(by_fmt) for by_fmt in entry['variants'].values()):
+        return False
+    return all(os.path.exists(os.path.join(client_public_path, p.lstrip('/'))) for p in files)
+
+
+# --- 3. MAIN ---
+def main():
+    print("🖼️ Mirroring cover images...")
+    input_file = find_stage_input(input_excel_filename)
+    if not input_file:
+        print(f"❌ ERROR: '{input_excel_filename}' not found. Run clean_data.py first.")
+        return
+    print(f"Loading: {input_file}")
+    df = read_table(input_file)
+
+    usable_formats = [f for f in formats if features.check(f)]
+    if len(usable_formats) < len(formats):
+        print(f"⚠️ This Pillow can't write {sorted(set(formats) - set(usable_formats))}, skipping them")
+
+    # --- Step 1: Covers not mirrored yet (or missing files / formats) ---
+    urls = df['Image_URL'].astype('string')
+    has_cover = urls.str.startswith('http').fillna(False)
+    manifest = load_manifest()
+    todo = sorted(u for u in set(urls[has_cover]) if u not in manifest or not is_complete(manifest[u], usable_formats))
+    print(f"📥 {int(has_cover.sum())} covers, {len(todo)} to mirror")
+
+    # --- Step 2: Download once, resize and preview in a process pool ---
+    if todo:
+        workers = default_workers("COVER_MIRROR_WORKERS", 0)  # 0 = one per CPU
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            mirrored = asyncio.run(mirror_covers(todo, pool, usable_formats, manifest))
+        manifest.update(mirrored)
+        write_json_atomic(manifest_filename, manifest, separators=(',', ':'))
+        print(f"✅ Mirrored {len(mirrored)}/{len(todo)} covers in {time.perf_counter() - start:.1f}s "
+              f"({workers} worker(s))")
+
+    # --- Step 3: Record local paths, sizes and previews in the dataset ---
+    entries = urls.map(manifest.get, na_action='ignore')
+    df['Cover_Hash'] = entries.map(lambda e: e['sha256'] if isinstance(e, dict) else None).astype('string')
+    df['Cover_Variants'] = entries.map(
+        lambda e: json.dumps(e['variants'], separators=(',', ':')) if isinstance(e, dict) else None).astype('string')
+    df['Cover_BlurHash'] = entries.map(lambda e: e['blurhash'] if isinstance(e, dict) else None).astype('string')
+    df['Cover_Color'] = entries.map(lambda e: e['color'] if isinstance(e, dict) else None).astype('string')
+
+    original_bytes = sum(e['original'][1] for e in manifest.values())
+    sized = {w: [min(size for _, size in e['variants'][w].values()) for e in manifest.values() if e['variants'].get(w)]
+             for w in map(str, widths)}
+    print(f"📦 Originals {original_bytes / 1e6:.1f} MB; smallest variant per cover: "
+          + ', '.join(f"{w}px {sum(s) / 1e6:.2f} MB ({len(s)} covers)" for w, s in sized.items()))
+
+    if export_excel:
+        df.to_excel(input_excel_filename, index=False)
+    # Written after the Excel copy so it counts as the newer one
+    write_table(df, columnar_path(input_excel_filename))
+    print(f"\n🎉 Done! {int(df['Cover_Hash'].notna().sum())} books have mirrored covers.")
+
+
+# The guard lets worker processes import this file without re-running it
+if __name__ == '__main__':
+    main()
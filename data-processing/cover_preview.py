@@ -0,0 +1,89 @@
+import numpy as np
+from PIL import Image
+
+# What the client paints while a cover loads: a BlurHash and one colour
+preview_width = 32
+components_x = 4
+components_y = 3
+
+_base83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+# --- 1. HELPERS ---
+def preview_pixels(img):
+    """(H, 32, 3) uint8 RGB array of a cover, aspect ratio kept."""
+    img = img.convert('RGB')
+    height = max(1, round(img.height * preview_width / img.width))
+    return np.asarray(img.resize((preview_width, height), Image.BILINEAR), dtype=np.uint8)
+
+
+def _srgb_to_linear(pixels):
+    v = pixels.astype(np.float64) / 255
+    return np.where(v <= 0.04045, v / 12.92, ((v + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(v):
+    v = np.clip(v, 0, 1)
+    return np.trunc(np.where(v <= 0.0031308, v * 12.92 * 255 + 0.5,
+                             (1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)).astype(int)
+
+
+def _encode83(value, length):
+    return ''.join(_base83[(int(value) // 83 ** (length - 1 - i)) % 83] for i in range(length))
+
+
+# --- 2. BLURHASH ---
+def blurhash(pixels, x_components=components_x, y_components=components_y):
+    """
+    BlurHash string of an (H, W, 3) RGB array, as the reference encoder
+    (github.com/woltapp/blurhash) computes it. All basis functions are
+    applied at once: one einsum over cosine tables instead of a Python loop
+    per component and pixel.
+    """
+    linear = _srgb_to_linear(np.asarray(pixels)[:, :, :3])
+    h, w = linear.shape[:2]
+    cos_x = np.cos(np.pi * np.arange(x_components)[:, None] * np.arange(w)[None, :] / w)
+    cos_y = np.cos(np.pi * np.arange(y_components)[:, None] * np.arange(h)[None, :] / h)
+    # factors[j, i] = colour weight of basis (i, j); DC is normalized by 1, the rest by 2
+    factors = np.einsum('jy,ix,yxc->jic', cos_y, cos_x, linear) / (w * h)
+    factors[1:] *= 2
+    factors[0, 1:] *= 2
+    factors = factors.reshape(-1, 3)  # rows ordered j outer, i inner
+    dc, ac = factors[0], factors[1:]
+
+    out = _encode83((x_components - 1) + (y_components - 1) * 9, 1)
+    if len(ac):
+        quantised_max = int(max(0, min(82, np.floor(np.abs(ac).max() * 166 - 0.5))))
+        maximum = (quantised_max + 1) / 166
+        out += _encode83(quantised_max, 1)
+    else:
+        maximum = 1
+        out += _encode83(0, 1)
+
+    r, g, b = _linear_to_srgb(dc)
+    out += _encode83((r << 16) + (g << 8) + b, 4)
+
+    scaled = ac / maximum
+    quant = np.clip(np.floor(np.sign(scaled) * np.abs(scaled) ** 0.5 * 9 + 9.5), 0, 18).astype(int)
+    for qr, qg, qb in quant:
+        out += _encode83(qr * 19 * 19 + qg * 19 + qb, 2)
+    return out
+
+
+# --- 3. DOMINANT COLOUR ---
+def dominant_color(pixels):
+    """
+    '#rrggbb': mean of the pixels in the most common 4-bit-per-channel bin,
+    so a cover's main colour rather than the average of all of them.
+    """
+    rgb = np.asarray(pixels)[:, :, :3].reshape(-1, 3).astype(np.int64)
+    bins = (rgb[:, 0] >> 4) << 8 | (rgb[:, 1] >> 4) << 4 | (rgb[:, 2] >> 4)
+    top = np.argmax(np.bincount(bins, minlength=4096))
+    r, g, b = np.round(rgb[bins == top].mean(axis=0)).astype(int)
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def cover_preview(img):
+    """{'blurhash', 'color'} of one decoded cover."""
+    pixels = preview_pixels(img)
+    return {'blurhash': blurhash(pixels), 'color': dominant_color(pixels)}
@@ -0,0 +1,175 @@
+import bisect
+import json
+import threading
+import time
+from collections import Counter
+
+from json_stream import write_bytes_atomic
+
+# Prometheus label name for each counter family
+label_names = {'zoom_winner': 'zoom', 'image_source': 'source', 'rejected': 'reason', 'probe_errors': 'reason'}
+
+# Upper bounds (seconds) of the latency buckets, Prometheus style (+Inf implied)
+latency_buckets = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram."""
+
+    def __init__(self, buckets=latency_buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (rough p50/p95)."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets + ('+Inf',), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return '+Inf'
+
+    def to_dict(self):
+        cumulative, total = {}, 0
+        for bound, n in zip(self.buckets + ('+Inf',), self.counts):
+            total += n
+            cumulative[str(bound)] = total
+        return {'count': self.count, 'sum': round(self.sum, 6), 'buckets': cumulative,
+                'p50': self.quantile(0.5), 'p95': self.quantile(0.95)}
+
+
+class FetchMetrics:
+    """
+    Counters and histograms for the fetch stage.
+
+    Everything goes through one lock, so the sync loop, the event loop, the
+    decode threads and the exporter thread can all use the same instance.
+    Keys are only ever recorded by their scheduler label ("key 2/5").
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.histograms = {'lookup_seconds': Histogram(), 'probe_seconds': Histogram()}
+        self.key_counts = {}  # label -> Counter(requests, 429, errors)
+        self.counters = Counter()  # "<family>:<value>" -> count
+        self.wait_seconds = 0.0
+        self.export_path = None
+        self.export_thread = None
+        self.stop_event = threading.Event()
+
+    # --- 1. RECORDING ---
+    def observe(self, name, seconds):
+        with self.lock:
+            self.histograms[name].observe(seconds)
+
+    def count(self, family, value, n=1):
+        with self.lock:
+            self.counters[f"{family}:{value}"] += n
+
+    def key_event(self, label, event):
+        """event is 'requests', '429' or 'errors'."""
+        with self.lock:
+            self.key_counts.setdefault(label, Counter())[event] += 1
+
+    def waited(self, seconds):
+        """Time a caller spent blocked on the key scheduler."""
+        with self.lock:
+            self.wait_seconds += seconds
+
+    # --- 2. SNAPSHOTS ---
+    def snapshot(self):
+        with self.lock:
+            families = {}
+            for name, n in self.counters.items():
+                family, _, value = name.partition(':')
+                families.setdefault(family, {})[value] = n
+            elapsed = time.monotonic() - self.started
+            work = self.histograms['lookup_seconds'].sum + self.histograms['probe_seconds'].sum
+            return {
+                'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'elapsed_seconds': round(elapsed, 3),
+                # Summed over all in-flight books, so both can exceed elapsed_seconds in async mode
+                'rate_limit_wait_seconds': round(self.wait_seconds, 3),
+                'network_seconds': round(work, 3),
+                'histograms': {k: h.to_dict() for k, h in self.histograms.items()},
+                'keys': {k: dict(c) for k, c in sorted(self.key_counts.items())},
+                **families,
+            }
+
+    def to_prometheus(self):
+        """Same data in the Prometheus text format (node_exporter textfile collector)."""
+        snap = self.snapshot()
+        lines = [
+            f"bookwormed_fetch_elapsed_seconds {snap['elapsed_seconds']}",
+            f"bookwormed_fetch_rate_limit_wait_seconds_total {snap['rate_limit_wait_seconds']}",
+            f"bookwormed_fetch_network_seconds_total {snap['network_seconds']}",
+        ]
+        for name, h in snap['histograms'].items():
+            metric = f"bookwormed_fetch_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            for bound, n in h['buckets'].items():
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {n}')
+            lines.append(f"{metric}_sum {h['sum']}")
+            lines.append(f"{metric}_count {h['count']}")
+        for label, events in snap['keys'].items():
+            for event, n in events.items():
+                lines.append(f'bookwormed_fetch_key_{event.replace("429", "rate_limited")}_total{{key="{label}"}} {n}')
+        for family, values in snap.items():
+            if isinstance(values, dict) and family not in ('histograms', 'keys'):
+                for value, n in sorted(values.items()):
+                    label = label_names.get(family, 'value')
+                    lines.append(f'bookwormed_fetch_{family}_total{{{label}="{value}"}} {n}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path=None):
+        """Write a snapshot: Prometheus text for *.prom, JSON otherwise. Atomic."""
+        path = path or self.export_path
+        if path.endswith('.prom'):
+            text = self.to_prometheus()
+        else:
+            text = json.dumps(self.snapshot(), indent=2)
+        write_bytes_atomic(path, text.encode('utf-8'), only_if_changed=False)
+
+    # --- 3. PERIODIC EXPORT ---
+    def start_export(self, path, interval=10.0):
+        """Rewrite `path` every `interval` seconds from a daemon thread until stop_export()."""
+        self.export_path = path
+        self.started = time.monotonic()
+
+        def loop():
+            while not self.stop_event.wait(interval):
+                self.write()
+
+        self.export_thread = threading.Thread(target=loop, name='fetch-metrics', daemon=True)
+        self.export_thread.start()
+
+    def stop_export(self):
+        """Stop the exporter and write the final snapshot."""
+        if self.export_thread is None:
+            return
+        self.stop_event.set()
+        self.export_thread.join()
+        self.export_thread = None
+        self.write()
+
+    def summary(self):
+        snap = self.snapshot()
+        lookup, probe = snap['histograms']['lookup_seconds'], snap['histograms']['probe_seconds']
+        return (f"lookups: {lookup['count']} (p50 ≤{lookup['p50']}s, p95 ≤{lookup['p95']}s), "
+                f"probes: {probe['count']} (p50 ≤{probe['p50']}s, p95 ≤{probe['p95']}s), "
+                f"waiting on keys: {snap['rate_limit_wait_seconds']:.0f}s, "
+                f"zoom winners: {snap.get('zoom_winner', {})}, rejected: {snap.get('rejected', {})}")
+
+
+# Shared by clean_data.py, async_fetcher.py and image_probe.py
+metrics = FetchMetrics()
@@ -1,69 +1,68 @@
-import json
-import re
+import os
+from genre_index import GenreIndexBuilder, assign_genre_ids, load_genre_ids
+from genre_parser import parse_genres_field
+from json_stream import AtomicJsonArrayWriter, iter_json_array, write_json_atomic
+from pipeline_state import book_key, dedupe_keys, describe, record_hash, record_stage
 
 infile = 'final_book_data_fixed.json'
 outfile_books = 'final_book_data_fixed.json'
-outfile_genres = '..\\client\\public\\genres.json'
+outfile_genres = os.path.join('..', 'client', 'public', 'genres.json')
+# genre -> book ids (positions in books_full.json) for local genre filtering
+outfile_genre_index = os.path.join('..', 'client', 'public', 'genre_index.json')
 
+# Only the genre vocabulary stays in memory; books are streamed
+# from infile to outfile_books one record at a time.
 seen = set()
-
-def parse_genres_field(g):
-    if not g:
-        return []
-    if isinstance(g, list):
-        return [str(x).strip() for x in g if x]
-    s = str(g).strip()
-
-    # Try JSON style with single quotes
-    if s.startswith('[') and s.endswith(']'):
-        try:
-            js = s.replace("'", '"')
-            arr = json.loads(js)
-            return [str(x).strip() for x in arr if x]
-        except:
-            # fallback regex
-            items = re.findall(r"'([^']+)'", s)
-            if items:
-                return [it.strip() for it in items]
-
-    # last fallback: split by comma
-    parts = [p.strip() for p in re.split(r',|;', s) if p.strip()]
-    return parts
-
 all_genres = []
-fixed_books = []
+genre_index = GenreIndexBuilder()
+# per-book key and content hash, for the changeset
+book_ids, book_hashes = [], []
 
-with open(infile, 'r', encoding='utf-8') as f:
-    data = json.load(f)
+# Written to a temp file and renamed at the end, so overwriting the input
+# in place can't leave a half-written file if the run dies. If the result is
+# the same as before the old file is kept as is (and so are the ones below).
+with AtomicJsonArrayWriter(outfile_books, indent=2) as books_out:
+    for book_id, row in enumerate(iter_json_array(infile)):
+        g = row.get('Genres') or row.get('genres')
+        items = parse_genres_field(g)
 
-for row in data:
-    g = row.get('Genres') or row.get('genres')
-    items = parse_genres_field(g)
+        # save cleaned genres back into book object
+        row['Genres'] = items
+        books_out.write(row)
+        book_ids.append(book_key(row.get('Book'), row.get('Author')))
+        book_hashes.append(record_hash(row))
 
-    # save cleaned genres back into book object
-    row['Genres'] = items  
-    fixed_books.append(row)
-
-    # also build global genre list
-    for it in items:
-        it_clean = ' '.join(it.split())
-        if it_clean and it_clean.lower() not in seen:
-            seen.add(it_clean.lower())
-            all_genres.append(it_clean)
+        # also build global genre list
+        keys = []
+        for it in items:
+            it_clean = ' '.join(it.split())
+            if it_clean and it_clean.lower() not in seen:
+                seen.add(it_clean.lower())
+                all_genres.append(it_clean)
+            if it_clean:
+                keys.append(it_clean.lower())
+        genre_index.add(book_id, keys)
 
 # sort genres
 all_genres.sort(key=lambda x: x.lower())
 
+# ids survive new genres being added (they aren't positions in the list)
+known_ids, next_id = load_genre_ids(outfile_genre_index)
+genre_ids, next_id = assign_genre_ids([g.lower() for g in all_genres], known_ids, next_id)
+
 # write global genre dropdown file
-genres_output = [{'value': g.lower(), 'label': g} for g in all_genres]
+genres_output = [{'value': g.lower(), 'label': g, 'id': genre_ids[g.lower()]} for g in all_genres]
+
+write_json_atomic(outfile_genres, genres_output, ensure_ascii=False, indent=2)
 
-with open(outfile_genres, 'w', encoding='utf-8') as f:
-    json.dump(genres_output, f, ensure_ascii=False, indent=2)
+# write inverted index (same ids as genres.json), kept compact
+write_json_atomic(outfile_genre_index, genre_index.to_dict(genres_output, genre_ids, next_id),
+                  ensure_ascii=False, separators=(',', ':'))
 
-# write FIXED book data
-with open(outfile_books, 'w', encoding='utf-8') as f:
-    json.dump(fixed_books, f, ensure_ascii=False, indent=2)
+changes = record_stage('generate_genres', dedupe_keys(book_ids), book_hashes)
 
 print("Done!")
+print(f"- Changes since last run: {describe(changes)} (see changesets/generate_genres.json)")
 print(f"- Fixed books saved to {outfile_books}")
 print(f"- Genres saved to {outfile_genres}")
+print(f"- Genre index saved to {outfile_genre_index}")
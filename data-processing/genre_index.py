@@ -0,0 +1,111 @@
+import json
+import os
+from array import array
+
+import numpy as np
+
+
+def delta_encode(ids):
+    """[3, 7, 8, 20] -> [3, 4, 1, 12]. `ids` must be sorted."""
+    ids = np.asarray(ids, dtype=np.int64)
+    if ids.size == 0:
+        return []
+    return np.diff(ids, prepend=0).tolist()
+
+
+def delta_decode(deltas):
+    return np.cumsum(np.asarray(deltas, dtype=np.int64))
+
+
+class GenreIndexBuilder:
+    """
+    Inverted index genre -> sorted list of book ids, built while streaming.
+
+    A book id is the record's position in final_book_data_fixed.json (the
+    same order as books_full.json). Postings are kept as compact uint32
+    arrays; ids only ever grow, so they are sorted without a sort.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.num_books = 0
+
+    def add(self, book_id, genre_keys):
+        for key in set(genre_keys):
+            self.postings.setdefault(key, array('I')).append(book_id)
+        self.num_books = max(self.num_books, book_id + 1)
+
+    def to_dict(self, genres, ids=None, next_id=0):
+        """
+        `genres` is the genres.json list ({'value', 'label', 'id'}), in
+        dropdown order. Ids come from assign_genre_ids, so they stay the same
+        from run to run.
+        """
+        if ids is None:
+            ids, next_id = assign_genre_ids([g['value'] for g in genres])
+        out = []
+        for g in genres:
+            book_ids = self.postings.get(g['value'], array('I'))
+            out.append({
+                'id': ids[g['value']],
+                'value': g['value'],
+                'label': g['label'],
+                'count': len(book_ids),
+                'postings': delta_encode(book_ids),
+            })
+        return {'version': 2, 'num_books': self.num_books, 'encoding': 'delta',
+                'next_id': max([next_id] + [i + 1 for i in ids.values()]), 'genres': out}
+
+
+# --- Stable genre ids ---
+def load_genre_ids(path):
+    """({genre value: id}, next free id) from an existing genre index, or ({}, 0)."""
+    if not os.path.exists(path):
+        return {}, 0
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('version', 1) < 2:
+        return {}, 0  # ids used to be positions in genres.json; start over once
+    ids = {g['value']: g['id'] for g in data['genres']}
+    return ids, max([data.get('next_id', 0)] + [i + 1 for i in ids.values()])
+
+
+def assign_genre_ids(values, known=None, next_id=0):
+    """
+    {value: id} for `values`: known genres keep their id, new ones get the
+    next free ids. Ids of genres that disappear are never handed out again,
+    so a cached index or a ?genre=<id> link can't point at another genre.
+    """
+    ids = {}
+    known = known or {}
+    next_id = max([next_id] + [i + 1 for i in known.values()])
+    for value in values:
+        if value in known:
+            ids[value] = known[value]
+        else:
+            ids[value] = next_id
+            next_id += 1
+    return ids, next_id
+
+
+# --- Reading / querying ---
+def load_genre_index(path):
+    """{genre value: numpy array of book ids}."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return {g['value']: delta_decode(g['postings']) for g in data['genres']}
+
+
+def books_with_genres(index, values, match='all'):
+    """Book ids tagged with every (match='all') or any (match='any') of the genre values."""
+    lists = [index.get(v.lower(), np.empty(0, dtype=np.int64)) for v in values]
+    if not lists:
+        return np.empty(0, dtype=np.int64)
+    if match == 'any':
+        return np.unique(np.concatenate(lists))
+
+    lists.sort(key=len)  # start from the rarest genre
+    result = lists[0]
+    for ids in lists[1:]:
+        result = np.intersect1d(result, ids, assume_unique=True)
+    return result
@@ -0,0 +1,74 @@
+import ast
+import json
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+
+# --- Single value ---
+@lru_cache(maxsize=None)
+def _parse_string(s):
+    """Parse one raw Genres string into a tuple (cached: the same strings repeat a lot)."""
+    s = s.strip()
+    if not s:
+        return ()
+
+    # Python-style list strings like "['Fantasy', "Children's"]"
+    if s.startswith('[') and s.endswith(']'):
+        for parse in (ast.literal_eval, json.loads):
+            try:
+                arr = parse(s)
+            except (ValueError, SyntaxError):
+                continue
+            if isinstance(arr, (list, tuple)):
+                return tuple(str(x).strip() for x in arr if x)
+        # fallback: extract quoted items
+        items = re.findall(r"'([^']+)'|\"([^\"]+)\"", s)
+        if items:
+            return tuple((a or b).strip() for a, b in items)
+
+    # fallback: split by comma/semicolon
+    return tuple(p.strip() for p in re.split(r',|;', s) if p.strip())
+
+
+def parse_genres_field(g):
+    """Normalize one Genres value (list, Python/JSON list string, or "a, b") to a list of strings."""
+    if g is None:
+        return []
+    if isinstance(g, (list, tuple)):
+        return [str(x).strip() for x in g if x]
+    try:
+        if pd.isna(g):
+            return []
+    except (TypeError, ValueError):
+        pass
+    return list(_parse_string(str(g)))
+
+
+# --- Whole column ---
+def parse_genres_series(values):
+    """
+    parse_genres_field over a Series or list.
+
+    Each distinct raw string is parsed once, so the cost follows the number
+    of distinct Genres strings, not the number of rows.
+    """
+    values = pd.Series(values)
+    out = pd.Series([[] for _ in range(len(values))], index=values.index, dtype=object)
+    present = values.notna()
+
+    if pd.api.types.infer_dtype(values[present], skipna=True) in ('string', 'empty'):
+        text = values[present]
+    else:
+        # Mixed column (already-parsed lists etc.): split off the strings
+        is_text = values.map(lambda v: isinstance(v, str)).astype(bool)
+        for i in values.index[present & ~is_text]:
+            out.at[i] = parse_genres_field(values.at[i])
+        text = values[present & is_text]
+
+    if len(text):
+        codes, uniques = pd.factorize(text)
+        parsed = [_parse_string(u) for u in uniques]
+        out[text.index] = pd.Series([list(parsed[c]) for c in codes], index=text.index, dtype=object)
+    return out
@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image
+
+from cover_hash import PlaceholderLibrary, placeholder_reason
+from fetch_metrics import metrics
+
+# --- Same limits as clean_data.is_valid_image ---
+min_width = 100
+min_height = 150
+placeholder_brightness = 150  # darkest pixel brighter than this -> placeholder
+
+# "hash" rejects blank covers and ones matching placeholder_hashes.json, so
+# pale real covers pass; "brightness" is the old darkest-pixel rule only
+placeholder_check = os.getenv("PLACEHOLDER_CHECK", "hash").strip().lower()
+placeholder_library = PlaceholderLibrary.load()
+
+
+def verdict_version(check=placeholder_check, library=placeholder_library):
+    """
+    What a verdict depends on besides the image: the size limits, the
+    placeholder check mode and the known placeholder hashes. Cached verdicts
+    from another version are fetched again (see LookupCache.get_image).
+    """
+    hashes = sorted(e['phash'] + e['dhash'] for e in library.entries)
+    digest = hashlib.sha1(','.join(hashes).encode('ascii')).hexdigest()[:10]
+    return f"{min_width}x{min_height}:{check}:{placeholder_brightness}:{library.distance}:{digest}"
+
+
+# Computed once: the library is loaded once per run as well
+image_verdict_version = verdict_version()
+
+# Give up looking for the dimensions after this many bytes and just decode
+max_header_bytes = 64 * 1024
+chunk_size = 4096
+
+# Pillow releases the GIL while decoding, so threads are enough here and
+# the image bytes don't have to be copied to another process.
+decode_pool = ThreadPoolExecutor(max_workers=4)
+
+
+# --- 1. DIMENSIONS FROM THE FIRST BYTES ---
+def _jpeg_size(data):
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:  # markers without a length
+            i += 2
+            continue
+        # SOF0..SOF15 hold the frame size (C4/C8/CC are other tables)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            h, w = struct.unpack('>HH', data[i + 5:i + 9])
+            return w, h
+        i += 2 + struct.unpack('>H', data[i + 2:i + 4])[0]
+    return None
+
+
+def image_size_from_header(data):
+    """Return (width, height) from the start of a PNG/GIF/JPEG/WebP file, or None if not known yet."""
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and len(data) >= 24:
+        return struct.unpack('>II', data[16:24])
+    if data[:6] in (b'GIF87a', b'GIF89a') and len(data) >= 10:
+        return struct.unpack('<HH', data[6:10])
+    if data[:2] == b'\xff\xd8':
+        return _jpeg_size(data)
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP' and len(data) >= 30:
+        kind = data[12:16]
+        if kind == b'VP8X':
+            w = int.from_bytes(data[24:27], 'little') + 1
+            h = int.from_bytes(data[27:30], 'little') + 1
+            return w, h
+        if kind == b'VP8 ':
+            w, h = struct.unpack('<HH', data[26:30])
+            return w & 0x3FFF, h & 0x3FFF
+        if kind == b'VP8L':
+            bits = int.from_bytes(data[21:25], 'little')
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    return None
+
+
+def is_big_enough(size):
+    w, h = size
+    return w >= min_width and h >= min_height
+
+
+# --- 2. PLACEHOLDER CHECK ON A REDUCED DECODE ---
+def check_image_bytes(content):
+    """
+    Full check on a downloaded body: big enough and not a placeholder.
+
+    JPEGs are decoded at 1/4 scale with draft mode; other formats are
+    shrunk before the check. Either way the placeholder test runs on a
+    small grayscale image, not the full-resolution one.
+    """
+    img = Image.open(BytesIO(content))
+    if not is_big_enough(img.size):
+        metrics.count('rejected', 'undersized')
+        return False
+
+    img.draft('L', (img.width // 4, img.height // 4))
+    img = img.convert('L')
+    if img.width > 256:
+        img.thumbnail((256, 256))
+
+    # Until the library knows a placeholder (cover_fingerprints.py learns
+    # them), hash mode keeps the brightness rule as well
+    if placeholder_check == "brightness" or not placeholder_library.entries:
+        if img.getextrema()[0] > placeholder_brightness:
+            metrics.count('rejected', 'placeholder')
+            return False
+    if placeholder_check != "brightness" and placeholder_reason(img, placeholder_library):
+        metrics.count('rejected', 'placeholder')
+        return False
+
+    return True
+
+
+def safe_check_image_bytes(content):
+    try:
+        return check_image_bytes(content)
+    except Exception:
+        metrics.count('rejected', 'unreadable')
+        return False
+
+
+# --- 3. STREAMED DOWNLOAD ---
+class HeaderSniffer:
+    """
+    Collects a streamed body chunk by chunk.
+
+    `feed` returns False as soon as the header says the image is too small,
+    so the caller can drop the connection before downloading the rest.
+    """
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.size = None
+
+    def feed(self, chunk):
+        self.buf += chunk
+        if self.size is None and len(self.buf) <= max_header_bytes:
+            self.size = image_size_from_header(self.buf)
+            if self.size is not None and not is_big_enough(self.size):
+                metrics.count('rejected', 'undersized')
+                return False
+        return True
+
+    @property
+    def content(self):
+        return bytes(self.buf)
+
+
+def _is_retryable(status):
+    if status == 429 or status >= 500:
+        metrics.count('probe_errors', status)
+        return True
+    return False
+
+
+def _not_an_image(status, content_type):
+    if status != 200 or not content_type.startswith("image"):
+        metrics.count('rejected', 'not_image')
+        return True
+    return False
+
+
+def is_valid_image_sync(session, url):
+    """
+    requests version: stream the body and stop early on small images.
+
+    Returns True/False for a definite answer and None when the probe failed
+    (timeout, 5xx, 429), so callers don't cache a transient error.
+    """
+    try:
+        with session.get(url, timeout=10, stream=True) as r:
+            if _is_retryable(r.status_code):
+                return None
+            if _not_an_image(r.status_code, r.headers.get("content-type", "")):
+                return False
+            sniffer = HeaderSniffer()
+            for chunk in r.iter_content(chunk_size):
+                if not sniffer.feed(chunk):
+                    return False
+    except Exception:
+        metrics.count('probe_errors', 'network')
+        return None
+    return safe_check_image_bytes(sniffer.content)
+
+
+async def is_valid_image_async(session, url, timeout=10):
+    """aiohttp version: same answers, decode runs in decode_pool off the event loop."""
+    import aiohttp
+
+    try:
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+            if _is_retryable(r.status):
+                return None
+            if _not_an_image(r.status, r.headers.get("content-type", "")):
+                return False
+            sniffer = HeaderSniffer()
+            async for chunk in r.content.iter_chunked(chunk_size):
+                if not sniffer.feed(chunk):
+                    return False
+    except Exception:
+        metrics.count('probe_errors', 'network')
+        return None
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(decode_pool, safe_check_image_bytes, sniffer.content)
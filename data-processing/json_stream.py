@@ -0,0 +1,133 @@
+import filecmp
+import json
+import os
+import tempfile
+
+_decoder = json.JSONDecoder()
+
+
+def iter_json_array(path, chunk_size=1 << 16):
+    """
+    Yield the items of a top-level JSON array one at a time.
+
+    Only the current chunk and the item being decoded are held in memory,
+    so files much bigger than RAM can be processed.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = f.read(chunk_size).lstrip()
+        if not buf.startswith('['):
+            raise ValueError(f"{path} does not contain a JSON array")
+        pos = 1
+        eof = False
+
+        while True:
+            # skip separators between items
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buf) and buf[pos] == ']':
+                return
+
+            try:
+                if pos >= len(buf):
+                    raise json.JSONDecodeError('need more data', buf, pos)
+                item, end = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf = buf[pos:] + chunk
+                pos = 0
+                continue
+
+            yield item
+            pos = end
+
+
+class AtomicJsonArrayWriter:
+    """
+    Write a JSON array item by item into a temp file next to `path`.
+
+    The temp file replaces `path` only when the `with` block finishes
+    without an error, so a crash never leaves a half-written file behind
+    (safe even when `path` is the file being read). Output matches
+    json.dump(items, f, ensure_ascii=False, indent=indent). If the result
+    is identical to the existing file, the old file is left untouched.
+    """
+
+    def __init__(self, path, indent=2, only_if_changed=True):
+        self.path = path
+        self.indent = indent
+        self.only_if_changed = only_if_changed
+        self.count = 0
+        self.changed = None
+
+    def __enter__(self):
+        folder = os.path.dirname(os.path.abspath(self.path))
+        fd, self.tmp_path = tempfile.mkstemp(prefix='.tmp_', suffix='.json', dir=folder)
+        self.f = os.fdopen(fd, 'w', encoding='utf-8')
+        self.f.write('[')
+        return self
+
+    def write(self, item):
+        text = json.dumps(item, ensure_ascii=False, indent=self.indent)
+        if self.indent is not None:
+            pad = ' ' * self.indent
+            text = '\n' + pad + text.replace('\n', '\n' + pad)
+        sep = ',' if self.indent is not None else ', '
+        self.f.write(text if self.count == 0 else sep + text)
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.f.write('\n]' if self.count and self.indent is not None else ']')
+            self.f.flush()
+            os.fsync(self.f.fileno())
+            self.f.close()
+            self.changed = _commit(self.tmp_path, self.path, self.only_if_changed)
+        else:
+            self.f.close()
+            os.remove(self.tmp_path)
+        return False
+
+
+def _commit(tmp_path, path, only_if_changed):
+    """Move a finished temp file into place. Returns False if `path` already had the same bytes."""
+    if only_if_changed and os.path.exists(path) and filecmp.cmp(tmp_path, path, shallow=False):
+        os.remove(tmp_path)
+        return False
+    os.chmod(tmp_path, 0o644)  # mkstemp creates it private
+    os.replace(tmp_path, path)
+    return True
+
+
+def write_bytes_atomic(path, data, only_if_changed=True):
+    """Bytes to a temp file (fsynced), then rename over `path` (unless nothing changed). Returns True if written."""
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', dir=folder)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        return _commit(tmp_path, path, only_if_changed)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json_atomic(path, data, only_if_changed=True, **kwargs):
+    """json.dump to a temp file, then rename over `path` (unless nothing changed). Returns True if written."""
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', suffix='.json', dir=folder)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        return _commit(tmp_path, path, only_if_changed)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
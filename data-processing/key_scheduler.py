@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+# --- Helper: Read a Retry-After header (seconds or HTTP date) ---
+def parse_retry_after(value):
+    """Return the Retry-After delay in seconds, or None if missing/unreadable."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Tokens refill at `rate` per second up to `capacity`. One request costs one token."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.strikes = 0  # consecutive 429s/errors, drives the default backoff
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until this bucket can serve one request."""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class KeyScheduler:
+    """
+    Routes each Google Books request to the key with the most headroom.
+
+    Every key has its own token bucket. A 429 only blocks that key (for the
+    Retry-After time when Google sends one, otherwise an exponential backoff),
+    the other keys keep working. Callers block only when every key is empty.
+    """
+
+    def __init__(self, keys, rate=1.0, burst=5, base_backoff=10.0, max_backoff=900.0):
+        self.keys = list(keys)
+        self.buckets = {k: TokenBucket(rate, burst) for k in self.keys}
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+
+    def label(self, key):
+        """Short name for logs, never the key itself."""
+        return f"key {self.keys.index(key) + 1}/{len(self.keys)}"
+
+    def try_acquire(self):
+        """Take a token from the best key. Returns (key, 0) or (None, seconds_to_wait)."""
+        with self.lock:
+            now = time.monotonic()
+            for bucket in self.buckets.values():
+                bucket.refill(now)
+
+            ready = [k for k in self.keys if self.buckets[k].wait_time(now) == 0]
+            if ready:
+                key = max(ready, key=lambda k: self.buckets[k].tokens)
+                self.buckets[key].tokens -= 1
+                return key, 0.0
+
+            return None, min(b.wait_time(now) for b in self.buckets.values())
+
+    def acquire(self):
+        """Blocking version for the sync fetch loop."""
+        while True:
+            key, wait = self.try_acquire()
+            if key is not None:
+                return key
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Async version: only the calling task waits."""
+        while True:
+            key, wait = self.try_acquire()
+            if key is not None:
+                return key
+            await asyncio.sleep(wait)
+
+    def penalize(self, key, retry_after=None):
+        """Back off one key after a 429 or error. Returns the delay used."""
+        with self.lock:
+            bucket = self.buckets[key]
+            bucket.strikes += 1
+            delay = parse_retry_after(retry_after)
+            if delay is None:
+                delay = min(self.max_backoff, self.base_backoff * 2 ** (bucket.strikes - 1))
+            bucket.tokens = 0
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + delay)
+            return delay
+
+    def report_success(self, key):
+        with self.lock:
+            self.buckets[key].strikes = 0
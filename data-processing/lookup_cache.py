@@ -0,0 +1,128 @@
+import json
+import re
+import sqlite3
+import time
+import unicodedata
+
+day = 24 * 60 * 60
+
+# Found results are trusted for a long time; misses are retried on a
+# growing schedule (1, 2, 4, ... days, capped) in case Google adds the book.
+hit_ttl = 180 * day
+miss_ttl = 1 * day
+max_miss_ttl = 60 * day
+
+
+def normalize_title(title):
+    """Cache key for a title: NFKC, lowercase, single spaces."""
+    s = unicodedata.normalize('NFKC', str(title)).lower()
+    return re.sub(r'\s+', ' ', s).strip()
+
+
+def _same_version(value, version):
+    return isinstance(value, dict) and value.get('version') == version
+
+
+class LookupCache:
+    """
+    On-disk cache for clean_data.py, backed by SQLite.
+
+    Three tables, one per kind of network call:
+      lookups - normalized title -> volume id + thumbnail (the volumes?q= search)
+      volumes - volume id -> best zoom URL (get_best_image)
+      images  - image URL -> valid / invalid (is_valid_image)
+
+    Volumes and images also store the image_probe.verdict_version their
+    answer was decided under; under another version they are misses.
+
+    Every entry has its own expiry. A miss (no volume, no valid zoom) is
+    stored too and expires after miss_ttl * 2**(attempts - 1).
+    """
+
+    def __init__(self, path='lookup_cache.sqlite'):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        for table, key in (('lookups', 'title'), ('volumes', 'volume_id'), ('images', 'url')):
+            self.db.execute(
+                f'CREATE TABLE IF NOT EXISTS {table} ('
+                f'{key} TEXT PRIMARY KEY, value TEXT, found INTEGER, '
+                'attempts INTEGER, fetched_at REAL, expires_at REAL)'
+            )
+        self.db.commit()
+        self.stats = {t: {'hits': 0, 'misses': 0} for t in ('lookups', 'volumes', 'images')}
+
+    # --- generic get/put ---
+    def _get(self, table, key_col, key, accept=None):
+        """Stored value, or None if missing, expired or rejected by `accept`."""
+        row = self.db.execute(
+            f'SELECT value, expires_at FROM {table} WHERE {key_col} = ?', (key,)
+        ).fetchone()
+        value = None if row is None or row[1] < time.time() else json.loads(row[0])
+        if value is None or (accept is not None and not accept(value)):
+            self.stats[table]['misses'] += 1
+            return None
+        self.stats[table]['hits'] += 1
+        return value
+
+    def _put(self, table, key_col, key, value, found):
+        now = time.time()
+        row = self.db.execute(
+            f'SELECT attempts FROM {table} WHERE {key_col} = ? AND found = 0', (key,)
+        ).fetchone()
+        attempts = 1 if found or row is None else row[0] + 1
+        ttl = hit_ttl if found else min(max_miss_ttl, miss_ttl * 2 ** (attempts - 1))
+        self.db.execute(
+            f'INSERT OR REPLACE INTO {table} ({key_col}, value, found, attempts, fetched_at, expires_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (key, json.dumps(value), int(bool(found)), attempts, now, now + ttl),
+        )
+        self.db.commit()
+
+    # --- title search ---
+    def get_lookup(self, title):
+        """Cached search result: {'volume_id': ..., 'thumbnail': ...}, or {} for a cached miss, or None."""
+        return self._get('lookups', 'title', normalize_title(title))
+
+    def put_lookup(self, title, volume_id, thumbnail):
+        value = {'volume_id': volume_id, 'thumbnail': thumbnail} if volume_id or thumbnail else {}
+        self._put('lookups', 'title', normalize_title(title), value, bool(value))
+
+    # --- best zoom per volume ---
+    def get_volume(self, volume_id, version):
+        """
+        Cached best image URL for a volume: a URL, '' for a cached miss, or
+        None if unknown or picked under another image verdict `version`.
+        """
+        # Entries cached before versions were stored are plain strings: unknown
+        entry = self._get('volumes', 'volume_id', volume_id, lambda v: _same_version(v, version))
+        return None if entry is None else entry['url']
+
+    def put_volume(self, volume_id, best_url, version):
+        self._put('volumes', 'volume_id', volume_id, {'url': best_url or '', 'version': version}, bool(best_url))
+
+    # --- image verdicts ---
+    def get_image(self, url, version):
+        """
+        Cached is_valid_image verdict: True/False, or None if unknown or
+        decided under another `version` (a new placeholder mode or library).
+        """
+        # Verdicts cached before versions were stored are plain booleans: unknown
+        entry = self._get('images', 'url', url, lambda v: _same_version(v, version))
+        return None if entry is None else entry['valid']
+
+    def put_image(self, url, valid, version):
+        # An invalid image is a final answer, so it gets the long TTL as well
+        self._put('images', 'url', url, {'valid': bool(valid), 'version': version}, True)
+
+    def report(self):
+        parts = []
+        for table, s in self.stats.items():
+            total = s['hits'] + s['misses']
+            rate = 100 * s['hits'] / total if total else 0
+            parts.append(f"{table}: {s['hits']} hits / {s['misses']} misses ({rate:.0f}%)")
+        return '📊 Cache ' + ', '.join(parts)
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,250 @@
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from genre_parser import parse_genres_field
+from json_stream import iter_json_array
+from pipeline_state import book_key, describe, load_state, record_hash, record_stage
+
+load_dotenv()  # Load the .env file
+
+# --- Same file names as update_url.py ---
+input_json_filename = 'final_book_data_fixed.json'
+# Same database as server/configs/mongodb.js: `${MONGODB_URI}/book_Worm`
+mongodb_uri = os.getenv("MONGODB_URI", "mongodb://127.0.0.1:27017")
+database_name = os.getenv("MONGODB_DB", "book_Worm")
+collection_name = 'books'  # mongoose's name for the Book model
+batch_size = int(os.getenv("MONGO_BATCH_SIZE", "1000"))
+# Bulk writes in flight at once, each on its own pooled connection
+concurrency = int(os.getenv("MONGO_CONCURRENCY", "4"))
+# Books are matched on this field, the pipeline's book_key
+key_field = 'sourceKey'
+synopsis_max_length = 5000  # bookModel.js maxLength
+# Kept up to date from user ratings by bookModel.updateAverageRating, so the
+# catalog's numbers are only the starting values of a new book
+insert_only_fields = ('averageRating', 'totalRatings')
+# What was loaded is remembered per target (see target_stage)
+stage_name = 'mongo_loader'
+
+
+# --- 1. MAPPING ---
+def _text(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    value = str(value).strip()
+    return None if value in ('', 'null') else value
+
+
+def _number(value, default=0):
+    if isinstance(value, str):
+        value = value.replace(',', '')  # "5,691,311", as in storage.enforce_types
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return default
+    return default if value != value else value
+
+
+def to_book_document(record):
+    """One final_book_data_fixed.json record -> the fields of the Book schema it fills."""
+    doc = {
+        'title': _text(record.get('Book')),
+        'author': _text(record.get('Author')) or 'Unknown',
+        'genres': parse_genres_field(record.get('Genres')),
+        'averageRating': min(max(_number(record.get('Avg_Rating')), 0), 5),
+        'totalRatings': int(_number(record.get('Num_Ratings'))),
+    }
+    synopsis = _text(record.get('Description'))
+    if synopsis:
+        doc['synopsis'] = synopsis[:synopsis_max_length]
+    cover = _text(record.get('Image_URL'))
+    doc['coverImage'] = cover if cover and cover.startswith('http') else ''
+    return doc
+
+
+def iter_documents(path):
+    """(key, document) for every record with a title; repeated keys get '#2', '#3', ... like book_keys."""
+    seen = {}
+    for record in iter_json_array(path):
+        doc = to_book_document(record)
+        if not doc['title']:
+            continue
+        key = book_key(record.get('Book'), record.get('Author'))
+        seen[key] = seen.get(key, 0) + 1
+        if seen[key] > 1:
+            key = f"{key}#{seen[key]}"
+        yield key, doc
+
+
+# --- 2. BULK UPSERTS ---
+def upsert_operation(key, doc):
+    """
+    Update the pipeline's fields of the book with this key, creating it if new.
+    Ratings, reviews and counters written by the app are never touched: the
+    rating fields are only set when the book is inserted.
+    """
+    fields = {k: v for k, v in doc.items() if k not in insert_only_fields}
+    on_insert = {k: doc[k] for k in insert_only_fields if k in doc}
+    return UpdateOne(
+        {key_field: key},
+        {
+            '$set': fields,
+            '$setOnInsert': {'language': 'English', 'isActive': True, 'ratings': [], 'totalReviews': 0,
+                             'viewCount': 0, 'addedToListsCount': 0, 'createdAt': datetime.now(timezone.utc),
+                             **on_insert},
+            '$currentDate': {'updatedAt': True},
+        },
+        upsert=True,
+    )
+
+
+def write_batch(collection, batch):
+    """One unordered bulk write. Returns (matched, upserted, modified, failed keys, seconds)."""
+    start = time.perf_counter()
+    try:
+        result = collection.bulk_write([upsert_operation(k, d) for k, d in batch], ordered=False)
+        details, failed = result.bulk_api_result, []
+    except BulkWriteError as e:
+        # Unordered: the rest of the batch is still written, only these failed
+        details = e.details
+        failed = [batch[err['index']][0] for err in details.get('writeErrors', [])]
+    return (details.get('nMatched', 0), details.get('nUpserted', 0), details.get('nModified', 0),
+            failed, time.perf_counter() - start)
+
+
+def load_books(collection, items, size=batch_size, workers=concurrency):
+    """
+    Upsert (key, document) pairs in batches of `size`, with up to `workers`
+    batches in flight. Batches are built while earlier ones are written, and
+    at most 2 * workers are queued, so memory doesn't grow with the catalog.
+    """
+    totals = {'matched': 0, 'upserted': 0, 'modified': 0, 'failed': []}
+    latencies = []
+    books = 0
+
+    def collect(done):
+        for future in done:
+            matched, upserted, modified, failed, seconds = future.result()
+            totals['matched'] += matched
+            totals['upserted'] += upserted
+            totals['modified'] += modified
+            totals['failed'] += failed
+            latencies.append(seconds)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending, batch = set(), []
+        for key, doc in items:
+            batch.append((key, doc))
+            books += 1
+            if len(batch) >= size:
+                pending.add(pool.submit(write_batch, collection, batch))
+                batch = []
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+        if batch:
+            pending.add(pool.submit(write_batch, collection, batch))
+        collect(pending)
+
+    totals['seconds'] = time.perf_counter() - start
+    totals['books'] = books
+    totals['batch_seconds'] = sorted(latencies)
+    return totals
+
+
+def target_stage(uri, db):
+    """
+    Stage name for one server/database/collection, so loading into another
+    database doesn't look like "nothing changed". The URI is hashed: it may
+    hold a password.
+    """
+    digest = hashlib.sha1(f"{uri}\x1f{db}\x1f{collection_name}".encode('utf-8')).hexdigest()[:10]
+    return f"{stage_name}-{digest}"
+
+
+def ensure_indexes(collection):
+    # Sparse, so books added by seedBooks.js or the app (no key) are allowed
+    collection.create_index(key_field, unique=True, sparse=True)
+
+
+def report(totals):
+    seconds = max(totals['seconds'], 1e-9)
+    lat = totals['batch_seconds']
+    line = (f"📈 {totals['books']} books in {totals['seconds']:.1f}s ({totals['books'] / seconds:,.0f} books/s): "
+            f"{totals['upserted']} inserted, {totals['modified']} modified, "
+            f"{totals['matched'] - totals['modified']} already up to date")
+    if lat:
+        line += (f"; {len(lat)} batches, p50 {lat[len(lat) // 2] * 1000:.0f}ms, "
+                 f"p95 {lat[min(len(lat) - 1, int(len(lat) * 0.95))] * 1000:.0f}ms")
+    print(line)
+    if totals['failed']:
+        print(f"⚠️ {len(totals['failed'])} book(s) failed to write, e.g. {totals['failed'][:5]}")
+
+
+# --- 3. MAIN ---
+def main():
+    parser = argparse.ArgumentParser(description='Upsert the processed catalog into the Book collection.')
+    parser.add_argument('--input', default=input_json_filename)
+    parser.add_argument('--uri', default=mongodb_uri, help='MongoDB server (MONGODB_URI)')
+    parser.add_argument('--db', default=database_name, help='database (MONGODB_DB)')
+    parser.add_argument('--batch-size', type=int, default=batch_size, help='upserts per bulk write (MONGO_BATCH_SIZE)')
+    parser.add_argument('--concurrency', type=int, default=concurrency,
+                        help='bulk writes in flight (MONGO_CONCURRENCY)')
+    parser.add_argument('--all', action='store_true', help='write every book, not only those changed since the last load')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"❌ ERROR: '{args.input}' not found. Run update_url.py first.")
+        return
+
+    print(f"📚 Loading books from {args.input} into {args.db}.{collection_name}...")
+    client = MongoClient(args.uri, maxPoolSize=max(args.concurrency, 1) + 1)
+    collection = client[args.db][collection_name]
+    ensure_indexes(collection)
+
+    # --- Step 1: Only books whose mapped fields changed since the last load ---
+    stage = target_stage(args.uri, args.db)
+    previous = {} if args.all else load_state(stage)
+    if previous:
+        # Collection dropped or emptied since: the remembered state is wrong
+        present = collection.count_documents({key_field: {'$exists': True}})
+        if present < len(previous):
+            print(f"♻️ Only {present} of {len(previous)} loaded books are in the collection, writing all of them")
+            previous = {}
+    current = {}
+
+    def changed_documents():
+        for key, doc in iter_documents(args.input):
+            current[key] = record_hash(doc)
+            if previous.get(key) != current[key]:
+                yield key, doc
+
+    # --- Step 2: Batched unordered upserts ---
+    totals = load_books(collection, changed_documents(), args.batch_size, args.concurrency)
+    report(totals)
+    client.close()
+
+    # Failed books keep their old state, so they are retried next time
+    for key in totals['failed']:
+        if key in previous:
+            current[key] = previous[key]
+        else:
+            current.pop(key, None)
+    changes = record_stage(stage, list(current), list(current.values()))
+    print(f"🧾 Since last load: {describe(changes)} (see changesets/{stage}.json)")
+    if changes['removed']:
+        # Users may have rated or listed them, so they stay in the database
+        print(f"ℹ️ {len(changes['removed'])} book(s) no longer in the catalog were left in MongoDB")
+    print(f"\n🎉 Done! {len(current)} books in the catalog, {totals['books']} written.")
+
+
+if __name__ == '__main__':
+    main()
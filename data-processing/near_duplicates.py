@@ -0,0 +1,221 @@
+import re
+import unicodedata
+from array import array
+
+import numpy as np
+import pandas as pd
+
+# --- Settings ---
+num_perm = 64          # MinHash signature length
+bands = 16             # LSH bands of num_perm // bands rows: pairs above ~0.5 similarity meet
+title_threshold = 0.85 # verified title shingle Jaccard needed to merge two books
+author_threshold = 0.6 # verified author token Jaccard (a missing author always passes)
+
+_prime = 4294967311  # smallest prime above 2**32
+_bracketed = re.compile(r'\([^()]*\)|\[[^\[\]]*\]')
+_non_word = re.compile(r'[^\w\s]')
+
+
+# --- 1. NORMALIZING AND SHINGLES ---
+def fold_text(s):
+    """NFKD without accents, lowercase, punctuation dropped, single spaces."""
+    if s is None or (not isinstance(s, str) and pd.isna(s)):
+        return ''
+    s = unicodedata.normalize('NFKD', str(s))
+    s = ''.join(c for c in s if not unicodedata.combining(c)).lower()
+    return ' '.join(_non_word.sub(' ', s).split())
+
+
+def normalize_title(title):
+    """'Dune (Dune #1)' -> 'dune'. Bracketed series / edition notes are dropped."""
+    if title is None or (not isinstance(title, str) and pd.isna(title)):
+        return ''
+    stripped = _bracketed.sub(' ', str(title))
+    return fold_text(stripped) or fold_text(title)
+
+
+def _map_unique(values, fn):
+    """fn over each distinct value once (authors and titles repeat a lot)."""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=False)
+    mapped = [fn(u) for u in uniques]
+    return [mapped[c] for c in codes]
+
+
+def title_shingles(title):
+    """Character 3-grams of a normalized title, with the word edges marked."""
+    t = f' {title} '
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+
+def _jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+# --- 2. MINHASH + LSH ---
+def shingle_codes(titles, authors):
+    """
+    Every row's shingles (title 3-grams + author words) as integer ids.
+
+    Returns (codes, lengths): one flat uint32 array plus each row's count,
+    instead of millions of small Python sets.
+    """
+    vocab = {}
+    codes, lengths = array('I'), array('q')
+    for title, author in zip(titles, authors):
+        row = title_shingles(title) | {'a:' + w for w in author}
+        codes.extend(vocab.setdefault(sh, len(vocab)) for sh in row)
+        lengths.append(len(row))
+    return np.frombuffer(codes, dtype=np.uint32), np.frombuffer(lengths, dtype=np.int64)
+
+
+def minhash_signatures(codes, lengths, seed=1, chunk_elements=8_000_000):
+    """
+    (len(lengths), num_perm) uint32 MinHash signatures of the rows from shingle_codes.
+
+    Shingle ids are hashed with num_perm universal hashes (a*x + b) mod p in
+    NumPy, a block of rows at a time so memory stays bounded on millions of
+    rows. Every row needs at least one shingle.
+    """
+    codes = codes.astype(np.uint64)
+
+    rng = np.random.default_rng(seed)
+    # a < 2**31 and x < 2**32 keep a*x + b inside uint64
+    a = rng.integers(1, 2 ** 31, size=(num_perm, 1), dtype=np.uint64)
+    b = rng.integers(0, 2 ** 32, size=(num_perm, 1), dtype=np.uint64)
+
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    signatures = np.empty((len(lengths), num_perm), dtype=np.uint32)
+    rows_per_block = max(1, int(chunk_elements // (num_perm * max(1, lengths.mean() if len(lengths) else 1))))
+    for lo in range(0, len(lengths), rows_per_block):
+        hi = min(lo + rows_per_block, len(lengths))
+        x = codes[starts[lo]:ends[hi - 1]]
+        hashed = (a * x + b) % np.uint64(_prime)
+        block = np.minimum.reduceat(hashed, starts[lo:hi] - starts[lo], axis=1)
+        signatures[lo:hi] = block.T.astype(np.uint32)  # the few values >= 2**32 just wrap
+    return signatures
+
+
+def lsh_candidates(signatures):
+    """
+    Candidate pairs (i, j), i < j, that share at least one LSH band.
+
+    Inside a bucket every member is paired with the bucket's first member
+    only, not with each other, so a huge bucket costs linear work. Clusters
+    are still joined up transitively by the union-find that follows.
+    """
+    n = len(signatures)
+    rows = num_perm // bands
+    # Random odd multipliers fold a band's values into one uint64 bucket key;
+    # a rare collision only adds a candidate that verification throws out
+    mix = np.random.default_rng(0).integers(1, 2 ** 63, size=rows, dtype=np.uint64) | np.uint64(1)
+    pairs = []
+    for band in range(bands):
+        chunk = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        bucket, _ = pd.factorize((chunk * mix).sum(axis=1))
+        order = np.argsort(bucket, kind='stable')
+        sorted_bucket = bucket[order]
+        is_first = np.r_[True, sorted_bucket[1:] != sorted_bucket[:-1]]
+        leader = order[np.maximum.accumulate(np.where(is_first, np.arange(n), 0))]
+        members = ~is_first
+        pairs.append(np.stack([leader[members], order[members]], axis=1))
+
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    pairs = np.concatenate(pairs)
+    lo, hi = np.minimum(pairs[:, 0], pairs[:, 1]), np.maximum(pairs[:, 0], pairs[:, 1])
+    return np.unique(np.stack([lo, hi], axis=1), axis=0)
+
+
+def find_root(parent, i):
+    """Root of `i` in a union-find parent array (list or numpy), halving the path on the way."""
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def union(parent, i, j):
+    """Join the sets of `i` and `j`; the smaller root wins, so roots are first members."""
+    ri, rj = find_root(parent, i), find_root(parent, j)
+    if ri != rj:
+        parent[max(ri, rj)] = min(ri, rj)
+
+
+# --- 3. CLUSTERS ---
+def find_duplicates(df, threshold=None):
+    """
+    Near-duplicate clusters over Book + Author.
+
+    Returns a frame with the index of `df` and two columns: `Cluster_ID`
+    (dense ids, in order of first appearance) and `Is_Canonical` (one row per
+    cluster: most Num_Ratings, then first in the file).
+
+    Rows with the same normalized title and author are grouped exactly first;
+    MinHash/LSH then proposes candidate pairs among the distinct titles and
+    each pair is checked on the real title shingle Jaccard (>= `threshold`)
+    and author token Jaccard before two clusters are joined.
+    """
+    threshold = title_threshold if threshold is None else threshold
+    titles = _map_unique(df['Book'], normalize_title)
+    authors = _map_unique(df['Author'], fold_text) if 'Author' in df.columns else [''] * len(df)
+
+    # Exact matches first, so LSH only sees distinct (title, author) pairs
+    keys = pd.Series([t + '\x1f' + a for t, a in zip(titles, authors)])
+    key_ids, uniques = pd.factorize(keys)
+    first = pd.Series(np.arange(len(df))).groupby(key_ids).first().to_numpy()
+    u_titles = [titles[i] for i in first]
+    u_authors = [set(authors[i].split()) for i in first]
+
+    parent = list(range(len(uniques)))
+    usable = [i for i, t in enumerate(u_titles) if len(t) >= 1]
+    if len(usable) > 1:
+        codes, lengths = shingle_codes((u_titles[i] for i in usable), (u_authors[i] for i in usable))
+        candidates = lsh_candidates(minhash_signatures(codes, lengths))
+        del codes
+        for x, y in candidates.tolist():
+            i, j = usable[x], usable[y]
+            if not (u_authors[i] and u_authors[j]) or _jaccard(u_authors[i], u_authors[j]) >= author_threshold:
+                if _jaccard(title_shingles(u_titles[i]), title_shingles(u_titles[j])) >= threshold:
+                    union(parent, i, j)
+
+    roots = np.array([find_root(parent, i) for i in range(len(uniques))])
+    row_root = roots[key_ids]
+    cluster_ids, _ = pd.factorize(row_root)
+
+    # Canonical row: most ratings, then earliest
+    ratings = pd.Series(0, index=range(len(df)), dtype='float64')
+    if 'Num_Ratings' in df.columns:
+        ratings = pd.to_numeric(df['Num_Ratings'].astype('string').str.replace(',', '', regex=False),
+                                errors='coerce').fillna(0).reset_index(drop=True)
+    order = pd.DataFrame({'cluster': cluster_ids, 'ratings': -ratings.to_numpy(), 'pos': np.arange(len(df))})
+    canonical_pos = order.sort_values(['cluster', 'ratings', 'pos']).drop_duplicates('cluster')['pos'].to_numpy()
+    is_canonical = np.zeros(len(df), dtype=bool)
+    is_canonical[canonical_pos] = True
+
+    return pd.DataFrame({'Cluster_ID': cluster_ids, 'Is_Canonical': is_canonical}, index=df.index)
+
+
+def cluster_report(df, clusters):
+    """Clusters with more than one row: the kept book and the ones merged into it."""
+    sizes = clusters['Cluster_ID'].map(clusters['Cluster_ID'].value_counts())
+    multi = clusters[sizes > 1]
+    report = []
+    for cluster_id, members in multi.groupby('Cluster_ID', sort=True):
+        canonical = members.index[members['Is_Canonical']][0]
+        report.append({
+            'cluster_id': int(cluster_id),
+            'kept': {'Book': df.at[canonical, 'Book'], 'Author': df.at[canonical, 'Author'] if 'Author' in df.columns else None},
+            'merged': [{'Book': df.at[i, 'Book'], 'Author': df.at[i, 'Author'] if 'Author' in df.columns else None}
+                       for i in members.index if i != canonical],
+        })
+    return report
+
+
+def dedupe_books(df, threshold=None):
+    """Keep the canonical row of every cluster. Returns (deduped df, clusters, report)."""
+    clusters = find_duplicates(df, threshold)
+    report = cluster_report(df, clusters)
+    return df[clusters['Is_Canonical']].copy(), clusters, report
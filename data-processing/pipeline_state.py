@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import time
+import unicodedata
+
+import pandas as pd
+
+from json_stream import write_bytes_atomic, write_json_atomic
+
+# What every stage saw last time: {book key: content hash}
+state_dir = '.pipeline_state'
+# What changed in the last run of each stage: added / updated / removed keys
+changeset_dir = 'changesets'
+
+
+# --- 1. HASHES ---
+def _norm(s):
+    """NFKC, lowercase, single spaces; missing values become ''."""
+    if s is None or (not isinstance(s, str) and pd.isna(s)):
+        return ''
+    return ' '.join(unicodedata.normalize('NFKC', str(s)).lower().split())
+
+
+def book_key(book, author):
+    """
+    Stable id for one book: a hash of the normalized title and author.
+
+    Doesn't depend on row position, so it survives reordering and edits to
+    other columns.
+    """
+    text = _norm(book) + '\x1f' + _norm(author)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def record_hash(record):
+    """Content hash of one JSON-able record (key order doesn't matter)."""
+    text = json.dumps(record, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def dedupe_keys(keys):
+    """Repeated keys get '#2', '#3', ... appended so every row has its own."""
+    keys = pd.Series(list(keys))
+    n = keys.groupby(keys).cumcount()
+    return keys.where(n == 0, keys + '#' + (n + 1).astype(str)).tolist()
+
+
+def book_keys(df):
+    """book_key for every row of a frame (unique per row)."""
+    authors = df['Author'] if 'Author' in df.columns else [None] * len(df)
+    keys = dedupe_keys(book_key(b, a) for b, a in zip(df['Book'], authors))
+    return pd.Series(keys, index=df.index)
+
+
+def content_hashes(df, columns=None):
+    """Hash of a row's values in `columns` (all columns by default)."""
+    columns = [c for c in (columns or df.columns) if c in df.columns]
+    text = df[columns].astype('string').fillna('\x00')
+    joined = pd.Series('', index=df.index, dtype='string')
+    for c in columns:
+        joined = joined + '\x1f' + text[c]
+    return pd.Series([hashlib.blake2b(s.encode('utf-8'), digest_size=12).hexdigest() for s in joined],
+                     index=df.index)
+
+
+# --- 2. STATE AND CHANGESETS ---
+def load_state(stage):
+    path = os.path.join(state_dir, f'{stage}.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def diff_state(old, new):
+    return {
+        'added': sorted(k for k in new if k not in old),
+        'updated': sorted(k for k in new if k in old and old[k] != new[k]),
+        'removed': sorted(k for k in old if k not in new),
+    }
+
+
+def record_stage(stage, keys, hashes):
+    """
+    Compare this run's rows with the last run of `stage`, write
+    changesets/<stage>.json and remember the new state. Returns the changes.
+    """
+    new = dict(zip(keys, hashes))
+    changes = diff_state(load_state(stage), new)
+
+    os.makedirs(state_dir, exist_ok=True)
+    os.makedirs(changeset_dir, exist_ok=True)
+    write_json_atomic(os.path.join(state_dir, f'{stage}.json'), new, separators=(',', ':'))
+    changeset = {'stage': stage, 'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'total': len(new)}
+    changeset.update(changes)
+    write_json_atomic(os.path.join(changeset_dir, f'{stage}.json'), changeset, indent=2)
+    return changes
+
+
+def describe(changes):
+    return ', '.join(f"{len(changes[k])} {k}" for k in ('added', 'updated', 'removed'))
+
+
+def carry_over(df, previous, column):
+    """
+    Fill empty `column` cells in `df` from rows of `previous` with the same
+    book key (the column is added if `df` lacks it). Returns how many.
+    """
+    if column not in df.columns:
+        df[column] = pd.Series(pd.NA, index=df.index, dtype=previous[column].dtype)
+    known = pd.Series(previous[column].values, index=book_keys(previous).values).dropna()
+    reused = book_keys(df).map(known)
+    fill = df[column].isna() & reused.notna()
+    df.loc[fill, column] = reused[fill]
+    return int(fill.sum())
+
+
+# --- 3. OUTPUTS ---
+def write_if_changed(path, data):
+    """Write bytes/str to `path` only if the content differs. Returns True if it was written."""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    if os.path.exists(path) and os.path.getsize(path) == len(data):
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    # Already compared above, so the temp file is moved into place unconditionally
+    return write_bytes_atomic(path, data, only_if_changed=False)
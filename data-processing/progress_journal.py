@@ -0,0 +1,66 @@
+import json
+import os
+
+import pandas as pd
+
+
+def _title(book):
+    """A title as it goes into the journal: missing values (None, NaN, pd.NA) become None."""
+    return None if pd.isna(book) else str(book)
+
+
+def same_book(a, b):
+    """Titles equal, with every kind of missing value equal to the others."""
+    return _title(a) == _title(b)
+
+
+class ProgressJournal:
+    """
+    Append-only JSONL log of fetch results, one line per finished book.
+
+    Each line is {"index": ..., "book": ..., "image_url": ...}. Writing a line
+    costs the same no matter how big the catalog is, and a crash loses at most
+    the line being written. `replay` rebuilds the results on the next start.
+    """
+
+    def __init__(self, path, fsync_every=50):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.pending = 0
+        self.f = open(path, 'a', encoding='utf-8')
+
+    def append(self, index, book, image_url):
+        line = json.dumps({'index': int(index), 'book': _title(book), 'image_url': image_url}, ensure_ascii=False)
+        self.f.write(line + '\n')
+        self.f.flush()  # survives a crash of this process
+        self.pending += 1
+        if self.pending >= self.fsync_every:  # and, now and then, of the machine
+            os.fsync(self.f.fileno())
+            self.pending = 0
+
+    def close(self):
+        if not self.f.closed:
+            self.f.flush()
+            os.fsync(self.f.fileno())
+            self.f.close()
+
+    def clear(self):
+        """Start an empty journal (after the final export has everything)."""
+        self.close()
+        self.f = open(self.path, 'w', encoding='utf-8')
+        self.pending = 0
+
+
+def replay(path):
+    """Read a journal into {index: (book, image_url)}. Later lines win; a torn last line is skipped."""
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            results[entry['index']] = (entry['book'], entry['image_url'])
+    return results
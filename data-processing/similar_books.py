@@ -0,0 +1,224 @@
+import json
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from bm25_index import tokenize
+from client_dataset import default_workers
+from genre_parser import parse_genres_series
+from near_duplicates import fold_text
+from pipeline_state import write_if_changed
+from storage import find_stage_input, read_table
+
+# --- Same file names as update_url.py ---
+input_excel_filename = 'final_book_data.xlsx'
+client_public_path = os.path.join('..', 'client', 'public')
+output_filename = os.path.join(client_public_path, 'similar_books.bin')
+
+top_k = int(os.getenv("SIMILAR_BOOKS_K", "10"))
+# Rows per block of the similarity product; bounds memory per worker
+block_rows = int(os.getenv("SIMILAR_BOOKS_BLOCK", "1024"))
+# How much each feature family counts in the cosine
+feature_weights = {'description': 1.0, 'genres': 0.6, 'author': 0.4}
+# Features in more than this share of books, or more than max_df_books books
+# ("Fiction", "novel"), are dropped: they add little after IDF but every pair
+# of books sharing one becomes a product term, so they decide the run time
+max_df_share = float(os.getenv("SIMILAR_BOOKS_MAX_DF", "0.25"))
+max_df_books = int(os.getenv("SIMILAR_BOOKS_MAX_DF_BOOKS", "20000"))
+# Description words need at least this many books to be a feature
+min_df = 2
+
+magic = b'NBRS'
+format_version = 1
+score_levels = 65535
+no_neighbour = 0xFFFFFFFF
+
+
+# --- 1. FEATURES ---
+def _tfidf(rows, cols, n_rows, sublinear=True):
+    """
+    L2-normalized TF-IDF matrix from (row, feature) occurrences, one per token.
+    Features in fewer than min_df or more than max_df_share / max_df_books
+    books are dropped.
+    """
+    rows, cols = np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+    n_cols = int(cols.max()) + 1 if len(cols) else 0
+    pair, tf = np.unique(rows * max(n_cols, 1) + cols, return_counts=True)
+    r, c = pair // max(n_cols, 1), pair % max(n_cols, 1)
+
+    df = np.bincount(c, minlength=n_cols)
+    keep_col = (df >= min_df) & (df <= max(min_df, min(max_df_share * n_rows, max_df_books)))
+    keep = keep_col[c]
+    r, c, tf = r[keep], c[keep], tf[keep]
+    # Renumber the surviving features densely
+    new_ids = np.cumsum(keep_col) - 1
+    c = new_ids[c]
+
+    idf = np.log((1 + n_rows) / (1 + df[keep_col])) + 1
+    values = (1 + np.log(tf) if sublinear else tf) * idf[c]
+    matrix = sp.csr_matrix((values.astype(np.float32), (r, c)), shape=(n_rows, int(keep_col.sum())))
+    return _normalize_rows(matrix)
+
+
+def _normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sp.diags((1 / norms).astype(np.float32)) @ matrix
+
+
+def _occurrences(token_lists):
+    """(row, feature id) for every token of every row."""
+    lengths = np.fromiter((len(t) for t in token_lists), dtype=np.int64, count=len(token_lists))
+    flat = pd.Series([w for t in token_lists for w in t], dtype=object)
+    ids, _ = pd.factorize(flat)
+    return np.repeat(np.arange(len(token_lists)), lengths), ids
+
+
+def build_features(df):
+    """
+    One sparse row per book: TF-IDF of Description, genres and author, each
+    block normalized and weighted by feature_weights, then the whole row
+    normalized, so a dot product is the weighted cosine.
+    """
+    n = len(df)
+    blocks = []
+
+    if 'Description' in df.columns:
+        descriptions = df['Description'].astype('string').fillna('')
+        tokens = [[] if d.strip() in ('', 'null') else tokenize(d) for d in descriptions]
+        blocks.append(('description', _tfidf(*_occurrences(tokens), n)))
+
+    if 'Genres' in df.columns:
+        genres = [[fold_text(g) for g in items if g] for items in parse_genres_series(df['Genres'])]
+        blocks.append(('genres', _tfidf(*_occurrences(genres), n, sublinear=False)))
+
+    if 'Author' in df.columns:
+        authors = [[a] if a else [] for a in (fold_text(a) for a in df['Author'])]
+        rows, ids = _occurrences(authors)
+        # An author is a feature even when they wrote one book here, and is never too common
+        blocks.append(('author', sp.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, ids)), shape=(n, int(ids.max()) + 1 if len(ids) else 0))))
+
+    weighted = [m * np.float32(np.sqrt(feature_weights[name])) for name, m in blocks if m.shape[1]]
+    if not weighted:
+        return sp.csr_matrix((n, 0), dtype=np.float32)
+    return _normalize_rows(sp.hstack(weighted, format='csr')).tocsr()
+
+
+# --- 2. TOP-K IN BLOCKS ---
+_features = None
+_features_t = None
+
+
+def _init_worker(features):
+    global _features, _features_t
+    _features = features
+    _features_t = features.T.tocsr()
+
+
+def _top_k_block(bounds):
+    """Neighbours of rows [start, end): one sparse (block x books) product, top k per row."""
+    start, end = bounds
+    scores = (_features[start:end] @ _features_t).tocsr()
+    ids = np.full((end - start, top_k), no_neighbour, dtype=np.uint32)
+    sims = np.zeros((end - start, top_k), dtype=np.float32)
+
+    for i in range(end - start):
+        lo, hi = scores.indptr[i], scores.indptr[i + 1]
+        cols, vals = scores.indices[lo:hi], scores.data[lo:hi]
+        mask = cols != start + i  # not yourself
+        cols, vals = cols[mask], vals[mask]
+        if not len(cols):
+            continue
+        # argpartition is linear in the row; a full sort of every candidate is not
+        k = min(top_k, len(cols))
+        best = np.argpartition(-vals, k - 1)[:k]
+        best = best[np.lexsort((cols[best], -vals[best]))]
+        ids[i, :k] = cols[best]
+        sims[i, :k] = vals[best]
+    return ids, sims
+
+
+def top_k_neighbours(features, workers=1):
+    """(ids, scores), each (books x top_k); missing neighbours are no_neighbour / 0."""
+    n = features.shape[0]
+    bounds = [(a, min(a + block_rows, n)) for a in range(0, n, block_rows)]
+    if workers <= 1:
+        _init_worker(features)
+        results = [_top_k_block(b) for b in bounds]
+    else:
+        # The matrix is sent to each worker once, not with every block
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(features,)) as pool:
+            results = list(pool.map(_top_k_block, bounds))
+    if not results:
+        return np.empty((0, top_k), dtype=np.uint32), np.empty((0, top_k), dtype=np.float32)
+    return np.vstack([r[0] for r in results]), np.vstack([r[1] for r in results])
+
+
+# --- 3. ARTIFACT ---
+def write_neighbours(path, ids, scores):
+    """
+    b'NBRS', uint32 version, uint32 header length, JSON header (padded to 4),
+    then ids as uint32[books * k] and scores as uint16[books * k]
+    (cosine * 65535). Book b's neighbours are entries b*k .. b*k+k-1;
+    0xFFFFFFFF marks an empty slot.
+    """
+    header = {'num_books': int(ids.shape[0]), 'k': int(ids.shape[1]), 'score_scale': 1 / score_levels,
+              'weights': feature_weights, 'empty': no_neighbour}
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    header_bytes += b' ' * (-len(header_bytes) % 4)
+    quantized = np.round(np.clip(scores, 0, 1) * score_levels).astype('<u2')
+    data = b''.join([magic, struct.pack('<II', format_version, len(header_bytes)), header_bytes,
+                     ids.astype('<u4').tobytes(), quantized.tobytes()])
+    return write_if_changed(path, data)
+
+
+def load_neighbours(path):
+    """(ids, scores) arrays of shape (books, k), as written by write_neighbours."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != magic:
+        raise ValueError(f"{path} is not a neighbours file")
+    version, header_len = struct.unpack_from('<II', data, 4)
+    header = json.loads(data[12:12 + header_len])
+    n, k = header['num_books'], header['k']
+    pos = 12 + header_len
+    ids = np.frombuffer(data, dtype='<u4', count=n * k, offset=pos).reshape(n, k)
+    scores = np.frombuffer(data, dtype='<u2', count=n * k, offset=pos + 4 * n * k).reshape(n, k)
+    return ids, scores.astype(np.float32) * header['score_scale']
+
+
+def main():
+    print("📚 Building similar-books neighbours...")
+    input_file = find_stage_input(input_excel_filename)
+    if not input_file:
+        print(f"❌ ERROR: '{input_excel_filename}' not found. Run update_url.py first.")
+        return
+    print(f"Loading: {input_file}")
+    df = read_table(input_file)
+
+    start = time.perf_counter()
+    features = build_features(df)
+    print(f"🧮 {features.shape[0]} books x {features.shape[1]} features ({features.nnz} non-zeros) "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    workers = default_workers("SIMILAR_BOOKS_WORKERS", 0)  # 0 = one per CPU
+    start = time.perf_counter()
+    ids, scores = top_k_neighbours(features, workers)
+    print(f"🔗 Top {top_k} neighbours in {time.perf_counter() - start:.1f}s ({workers} worker(s))")
+
+    os.makedirs(client_public_path, exist_ok=True)
+    if write_neighbours(output_filename, ids, scores):
+        print(f"✅ Wrote neighbours to: {output_filename}")
+    else:
+        print(f"✅ Neighbours unchanged: {output_filename}")
+
+
+# The guard lets worker processes import this file without re-running it
+if __name__ == '__main__':
+    main()
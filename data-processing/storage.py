@@ -0,0 +1,93 @@
+import os
+
+import pandas as pd
+
+# Column types shared by every stage. Parquet keeps them, so later stages
+# don't have to re-infer them from Excel cells.
+column_types = {
+    'Book': 'string',
+    'Author': 'string',
+    'Description': 'string',
+    'Genres': 'string',
+    'Avg_Rating': 'float64',
+    'Num_Ratings': 'Int64',
+    'URL': 'string',
+    'Image_URL': 'string',
+    'Amazon_URL': 'string',
+    'Cover_Hash': 'string',
+    'Cover_Variants': 'string',
+    'Cover_BlurHash': 'string',
+    'Cover_Color': 'string',
+}
+
+try:
+    import pyarrow  # noqa: F401
+    has_parquet = True
+except ImportError:
+    has_parquet = False
+
+
+def columnar_path(path):
+    """'final_book_data.xlsx' -> 'final_book_data.parquet'."""
+    return os.path.splitext(path)[0] + '.parquet'
+
+
+def enforce_types(df):
+    """Cast the known columns to their shared types (e.g. "5,691,311" -> 5691311)."""
+    df = df.copy()
+    for col, dtype in column_types.items():
+        if col not in df.columns:
+            continue
+        if dtype == 'Int64':
+            values = df[col].astype('string').str.replace(',', '', regex=False)
+            df[col] = pd.to_numeric(values, errors='coerce').round().astype('Int64')
+        elif dtype == 'float64':
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+        else:
+            df[col] = df[col].astype('string')
+    return df
+
+
+def read_table(path):
+    """Read a stage file by extension (.parquet, .feather or Excel) with shared column types."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.parquet':
+        return pd.read_parquet(path)
+    if ext == '.feather':
+        return pd.read_feather(path)
+    return enforce_types(pd.read_excel(path))
+
+
+def write_table(df, path):
+    """Write a stage file. Falls back to Excel when pyarrow isn't installed."""
+    df = enforce_types(df)
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.parquet', '.feather') and not has_parquet:
+        path = os.path.splitext(path)[0] + '.xlsx'
+        print(f"⚠️ pyarrow not installed, writing {path} instead")
+        ext = '.xlsx'
+    if ext == '.parquet':
+        df.to_parquet(path, index=False)
+    elif ext == '.feather':
+        df.reset_index(drop=True).to_feather(path)
+    else:
+        df.to_excel(path, index=False)
+    return path
+
+
+def find_stage_input(*excel_paths):
+    """
+    First existing input, preferring the Parquet copy of each Excel file.
+
+    Returns None if nothing exists. Excel is only read when no Parquet copy
+    is there (e.g. the very first run, or a hand-edited workbook that is
+    newer than its Parquet copy).
+    """
+    for path in excel_paths:
+        fast = columnar_path(path)
+        if os.path.exists(fast) and has_parquet:
+            if not os.path.exists(path) or os.path.getmtime(fast) >= os.path.getmtime(path):
+                return fast
+        if os.path.exists(path):
+            return path
+    return None
@@ -1,7 +1,10 @@
-import pandas as pd
 import os
-import json
-import re
+from autocomplete_index import build_autocomplete_index
+from bm25_index import build_bm25_index, write_bm25_index
+from client_dataset import build_client_dataset, client_columns, client_frame, default_workers, export_client_shards
+from json_stream import write_json_atomic
+from pipeline_state import book_keys, content_hashes, describe, record_stage, write_if_changed
+from storage import columnar_path, find_stage_input, read_table, write_table
 
 # --- Same file names as your main script ---
 original_clean_file = 'updated_goodreads_data.xlsx'
@@ -10,108 +13,85 @@ output_json_filename = 'final_book_data_fixed.json'
 output_excel_filename = 'final_book_data.xlsx'
 client_public_path = os.path.join('..', 'client', 'public')
 client_books_file = os.path.join(client_public_path, 'books_full.json')
-
-
-# --- Helper: Create Amazon Search URL ---
-def make_amazon_url(title, author):
-    if pd.isna(title):
-        return None
-    t = str(title).replace(" ", "+")
-    a = str(author).replace(" ", "+")
-    return f"https://www.amazon.in/s?k={t}+{a}"
-
-
-print("📘 Starting URL update script...")
-
-# --- Load data from the same file your image script uses ---
-if os.path.exists(output_excel_filename):
-    print(f"Loading: {output_excel_filename}")
-    df = pd.read_excel(output_excel_filename)
-
-elif os.path.exists(original_clean_file):
-    print(f"Loading: {original_clean_file}")
-    df = pd.read_excel(original_clean_file)
-
-else:
-    print(f"Loading raw file: {raw_file}")
-    df = pd.read_excel(raw_file)
-
-
-# --- Add Amazon_URL column ---
-print("🛒 Adding Amazon URLs...")
-
-if 'Amazon_URL' not in df.columns:
-    df['Amazon_URL'] = df.apply(
-        lambda row: make_amazon_url(row['Book'], row['Author']),
-        axis=1
-    )
-else:
-    df['Amazon_URL'] = df.apply(
-        lambda row: make_amazon_url(row['Book'], row['Author']) 
-        if pd.isna(row['Amazon_URL']) or row['Amazon_URL'] == "" 
-        else row['Amazon_URL'],
-        axis=1
-    )
-
-# --- Replace existing URL column with Amazon_URL (user requested) ---
-if 'Amazon_URL' in df.columns:
-    # Overwrite/replace the generic URL column with Amazon_URL values
-    df['URL'] = df['Amazon_URL']
+# Title/author autocomplete for the search box, ids match books_full.json
+client_autocomplete_file = os.path.join(client_public_path, 'autocomplete_index.json')
+# BM25 index over Description (binary, see bm25_index.py), ids match books_full.json
+client_description_index_file = os.path.join(client_public_path, 'description_index.bm25')
+# "full" writes books_full.json, "sharded" writes client/public/books/,
+# "both" writes both
+client_export = os.getenv("CLIENT_EXPORT", "full").strip().lower()
+client_shards_path = os.path.join(client_public_path, 'books')
+client_shard_size = int(os.getenv("CLIENT_SHARD_SIZE", "2000"))
+# Stages hand data to each other as Parquet; the .xlsx copy is optional
+export_excel = os.getenv("EXPORT_EXCEL", "on").strip().lower() != "off"
+
+
+def main():
+    print("📘 Starting URL update script...")
+
+    # --- Load data from the same file your image script uses ---
+    # (its Parquet copy when there is one, so Excel isn't parsed again)
+    input_file = find_stage_input(output_excel_filename, original_clean_file)
+    if input_file:
+        print(f"Loading: {input_file}")
+        df = read_table(input_file)
+
+    else:
+        print(f"Loading raw file: {raw_file}")
+        df = read_table(raw_file)
+
+    # --- Add Amazon_URL, replace URL with it, build the client dataset ---
+    # Amazon URLs are vectorized and properly encoded; rows that already have
+    # one are kept. With UPDATE_URL_WORKERS > 1 the rows are split into shards
+    # processed on several cores (same output as one core).
+    workers = default_workers()
+    print(f"🛒 Adding Amazon URLs and preparing client dataset ({workers} worker(s))...")
+    df, client_json = build_client_dataset(df, workers=workers)
     print('🔁 Replaced `URL` column with `Amazon_URL` values')
 
-# --- Create client/public/books_full.json for client-side searching and images ---
-print('📦 Preparing client public dataset...')
-try:
-    os.makedirs(client_public_path, exist_ok=True)
-    # Select and reorder useful columns for the client
-    columns_for_client = []
-    for c in ['Book', 'Author', 'Description', 'Genres', 'Avg_Rating', 'Num_Ratings', 'Image_URL', 'URL', 'Amazon_URL']:
-        if c in df.columns:
-            columns_for_client.append(c)
-
-    client_df = df[columns_for_client].copy()
-
-    # Ensure Genres is serializable and normalized as a real JSON array
-    def parse_genres_field(g):
-        # handle pandas NA
-        if pd.isna(g):
-            return []
-        # already a list
-        if isinstance(g, list):
-            return [str(x).strip() for x in g if x]
-        s = str(g).strip()
-        if not s:
-            return []
-        # handle Python-style list strings like "['Fantasy', 'Fiction']"
-        if s.startswith('[') and s.endswith(']'):
-            try:
-                js = s.replace("'", '"')
-                arr = json.loads(js)
-                if isinstance(arr, list):
-                    return [str(x).strip() for x in arr if x]
-            except Exception:
-                # fallback: extract quoted items
-                items = re.findall(r"'([^']+)'", s)
-                if items:
-                    return [it.strip() for it in items]
-        # fallback: split by comma/semicolon
-        parts = [p.strip() for p in re.split(r',|;', s) if p.strip()]
-        return parts
-
-    if 'Genres' in client_df.columns:
-        client_df['Genres'] = client_df['Genres'].apply(parse_genres_field)
-
-    # Ensure Genres is serializable (if stored as string, keep as-is)
-    client_df.to_json(client_books_file, orient='records', force_ascii=False, indent=2)
-    print(f'✅ Wrote client dataset to: {client_books_file}')
-except Exception as e:
-    print('⚠️ Failed to write client dataset:', e)
-
-
-# --- Save updated files ---
-print("💾 Saving updated files...")
-
-df.to_excel(output_excel_filename, index=False)
-df.to_json(output_json_filename, orient='records', indent=4)
-
-print("\n🎉 Done! Amazon URLs added successfully.")
+    # --- Write client/public/books_full.json for client-side searching and images ---
+    outputs_written = False
+    try:
+        os.makedirs(client_public_path, exist_ok=True)
+        if client_export in ('full', 'both'):
+            # Left untouched when nothing changed, so cached copies stay valid
+            if write_if_changed(client_books_file, client_json):
+                print(f'✅ Wrote client dataset to: {client_books_file}')
+            else:
+                print(f'✅ Client dataset unchanged: {client_books_file}')
+        if client_export in ('sharded', 'both'):
+            # Minified, popularity-ordered shards + .gz/.br and a manifest
+            manifest = export_client_shards(client_frame(df), client_shards_path, shard_size=client_shard_size)
+            print(f"✅ Wrote {len(manifest['shards'])} client shard(s) to: {client_shards_path}")
+        write_json_atomic(client_autocomplete_file, build_autocomplete_index(df),
+                          ensure_ascii=False, separators=(',', ':'))
+        print(f'✅ Wrote autocomplete index to: {client_autocomplete_file}')
+        if 'Description' in df.columns:
+            write_bm25_index(client_description_index_file, build_bm25_index(df['Description']))
+            print(f'✅ Wrote description search index to: {client_description_index_file}')
+        outputs_written = True
+    except Exception as e:
+        print('⚠️ Failed to write client dataset:', e)
+
+    # --- Save updated files ---
+    print("💾 Saving updated files...")
+
+    if export_excel:
+        df.to_excel(output_excel_filename, index=False)
+    # Written after the Excel copy so it counts as the newer one
+    write_table(df, columnar_path(output_excel_filename))
+    write_if_changed(output_json_filename, df.to_json(orient='records', indent=4))
+
+    # Only once everything is written, so a failed run is reported again next time
+    if outputs_written:
+        changes = record_stage('update_url', book_keys(df), content_hashes(df, client_columns))
+        print(f"🧾 Changes since last run: {describe(changes)} (see changesets/update_url.json)")
+    else:
+        print("🧾 Client outputs incomplete: changeset not advanced")
+
+    print("\n🎉 Done! Amazon URLs added successfully.")
+
+
+# The guard lets worker processes import this file without re-running it
+if __name__ == '__main__':
+    main()